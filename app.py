@@ -1,15 +1,23 @@
-from flask import Flask, render_template, request, Response, jsonify, send_file, send_from_directory
+from flask import Flask, Request, g, render_template, request, Response, jsonify, send_file, send_from_directory, stream_with_context
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge, UnsupportedMediaType
 import mediapipe as mp
 import numpy as np
 from scipy.spatial import distance as dis
 import cv2 as cv
 import os
+import sys
 import time
 import uuid
+import hashlib
 from datetime import datetime, timedelta
 import json
 import threading
+import queue
+import multiprocessing
+from multiprocessing import shared_memory
+from collections import deque, OrderedDict
+from concurrent.futures import Future
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image as ReportLabImage
@@ -23,8 +31,20 @@ import matplotlib.dates as mdates
 from io import BytesIO
 import base64
 import tempfile
+import sqlite3
+import socket
+import fcntl
+import zipfile
 import shutil
+import subprocess
 import traceback
+from urllib.parse import quote
+import tracemalloc
+import hmac
+from functools import wraps
+from types import MappingProxyType
+from contextlib import contextmanager
+import atexit
 import logging
 
 # Set up logging
@@ -38,7 +58,8 @@ application.config['UPLOAD_FOLDER'] = '/tmp/uploads'
 application.config['DETECTED_FOLDER'] = '/tmp/detected'
 application.config['REPORTS_FOLDER'] = '/tmp/reports'
 application.config['RECORDINGS_FOLDER'] = '/tmp/recordings'
-application.config['MAX_CONTENT_PATH'] = 10000000
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', 100 * 1024 * 1024))   # sama dengan batas di upload.js
+application.config['MAX_CONTENT_LENGTH'] = UPLOAD_MAX_BYTES + 1024 * 1024   # ruang untuk header multipart
 
 for folder in [application.config['UPLOAD_FOLDER'], application.config['DETECTED_FOLDER'], 
                application.config['REPORTS_FOLDER'], application.config['RECORDINGS_FOLDER']]:
@@ -75,7 +96,8 @@ session_data = {
     'client_alerts': [],
     'frame_counter': 0,
     'frame_timestamps': [],
-    'total_frames_processed': 0
+    'total_frames_processed': 0,
+    'detections_count': 0
 }
 
 # Variabel video recording
@@ -103,42 +125,1850 @@ DISTRACTION_THRESHOLDS = {
 
 ALERT_COOLDOWN = 5.0
 
+# Laporan Upload
+REPORT_MAX_DETECTION_ROWS = 50
+
+# Penerimaan Upload
+UPLOAD_CHUNK_SIZE = 64 * 1024   # byte per chunk saat menyalin stream upload
+UPLOAD_SNIFF_BYTES = 16         # header yang diperiksa sebelum file ditulis
+UPLOAD_EXTENSION_KINDS = {
+    'jpg': 'image', 'jpeg': 'image', 'png': 'image', 'bmp': 'image',
+    'mp4': 'video', 'avi': 'video', 'mov': 'video', 'mkv': 'video'
+}
+BATCH_EXTENSION_KINDS = dict(UPLOAD_EXTENSION_KINDS, zip='archive')   # arsip zip hanya untuk /api/detect/batch
+UPLOAD_ENDPOINTS = {'upload', 'api_detect', 'api_detect_batch'}   # hanya endpoint ini yang menulis part ke UPLOAD_FOLDER
+BATCH_UPLOAD_ENDPOINTS = {'api_detect_batch'}
+UPLOAD_SIGNATURES = [
+    (0, b'\xff\xd8\xff', 'image'),            # JPEG
+    (0, b'\x89PNG\r\n\x1a\n', 'image'),       # PNG
+    (0, b'BM', 'image'),                      # BMP
+    (4, b'ftyp', 'video'),                    # MP4 / MOV
+    (4, b'moov', 'video'),                    # MOV lama
+    (4, b'mdat', 'video'),
+    (4, b'wide', 'video'),
+    (8, b'AVI ', 'video'),                    # RIFF AVI
+    (0, b'\x1a\x45\xdf\xa3', 'video'),         # Matroska
+    (0, b'PK\x03\x04', 'archive')             # ZIP (batch)
+]
+
+# Batch Analisis Gambar
+BATCH_MAX_FILES = int(os.environ.get('BATCH_MAX_FILES', 5000))   # gambar maksimal per request batch
+BATCH_MAX_EXTRACTED_BYTES = 1024 * 1024 * 1024                   # total isi arsip zip yang diekstrak
+
+# Pelacakan Person Video Upload
+TRACK_IOU_THRESHOLD = 0.3       # IoU minimal untuk mencocokkan deteksi dengan track
+TRACK_CENTROID_RATIO = 0.5      # jarak centroid maksimal relatif terhadap ukuran bbox
+TRACK_MAX_GAP_SECONDS = 2.0     # track ditutup jika tidak terlihat selama ini
+
+# Pipeline Video
+VIDEO_PIPELINE_QUEUE_SIZE = 16  # frame maksimal di antrian decode dan encode
+
+# Profil Output Video
+VIDEO_OUTPUT_PROFILES = {
+    'full': {'write_video': True, 'max_width': None, 'max_fps': None, 'analysed_only': False},
+    'preview': {'write_video': True, 'max_width': 640, 'max_fps': 10, 'analysed_only': False},
+    'analysed': {'write_video': True, 'max_width': None, 'max_fps': None, 'analysed_only': True},
+    'none': {'write_video': False, 'max_width': None, 'max_fps': None, 'analysed_only': False}
+}
+DEFAULT_VIDEO_OUTPUT_PROFILE = os.environ.get('VIDEO_OUTPUT_PROFILE', 'full')
+FFMPEG_PATH = shutil.which('ffmpeg')
+
+# Streaming NDJSON
+STREAM_SEGMENT_FRAMES = 10      # frame teranalisis per record deteksi
+
 # Rekaman Frame
 FRAME_STORAGE_INTERVAL = 2
 MAX_STORED_FRAMES = 3000
 RECORDING_FPS = 5
 
-# MediaPipe
-face_detection = None
-face_mesh = None
+# Deteksi Perubahan Frame
+CHANGE_DETECTION_SIZE = (80, 60)     # resolusi grayscale untuk perbandingan
+CHANGE_DETECTION_THRESHOLD = 3.0     # mean absolute difference (0-255)
+CHANGE_DETECTION_MAX_REUSE = 10      # paksa deteksi penuh setelah N frame berturut-turut
+
+frame_change_state = {
+    'reference_gray': None,
+    'last_processed_frame': None,
+    'last_detections': [],
+    'consecutive_reuse': 0,
+    'frames_reused': 0
+}
+
+# Admission Control Frame
+FRAME_QUEUE_MAX_WAIT = 2.0                    # detik maksimal frame menunggu giliran
+PROCESSING_INTERVAL_BOUNDS_MS = (1000, 5000)  # rentang interval yang disarankan ke client
+PROCESSING_TIME_SMOOTHING = 0.3               # bobot EWMA waktu proses
+
+admission_condition = threading.Condition(threading.Lock())
+frame_admission = {
+    'next_ticket': 0,
+    'in_flight': False,
+    'pending_ticket': None,
+    'frames_dropped': 0,
+    'avg_processing_ms': 0.0
+}
+
+# Degradasi Adaptif
+# Landmark iris (refine_landmarks) aktif di semua level: tanpa iris NOT FOCUSED tidak bisa dideteksi
+DEGRADATION_LEVELS = [
+    {'inference_scale': 1.0, 'refine_landmarks': True, 'draw_overlay': True, 'save_crops': True, 'video_frame_step': 5},
+    {'inference_scale': 0.75, 'refine_landmarks': True, 'draw_overlay': True, 'save_crops': False, 'video_frame_step': 8},
+    {'inference_scale': 0.5, 'refine_landmarks': True, 'draw_overlay': False, 'save_crops': False, 'video_frame_step': 12},
+    {'inference_scale': 0.5, 'refine_landmarks': True, 'draw_overlay': False, 'save_crops': False, 'video_frame_step': 20}
+]
+DEGRADATION_STEP_DOWN_MS = 250    # turunkan kualitas jika inferensi rata-rata di atas ini
+DEGRADATION_STEP_UP_MS = 100      # naikkan kualitas jika inferensi rata-rata di bawah ini
+DEGRADATION_MIN_DWELL = 5.0       # detik minimal antar perubahan level
+
+degradation_lock = threading.Lock()
+degradation_state = {
+    'level': 0,
+    'avg_inference_ms': 0.0,
+    'last_change': 0.0,
+    'pinned': False
+}
+
+# Scheduler Inferensi
+LIVE_FRAME_SLO_MS = 300   # target waktu tunggu frame live di antrian
+
+inference_condition = threading.Condition(threading.Lock())
+inference_scheduler = {
+    'threads': [],
+    'live_queue': deque(),
+    'upload_queues': OrderedDict(),
+    'live_completed': 0,
+    'upload_completed': 0,
+    'live_slo_misses': 0,
+    'avg_live_wait_ms': 0.0
+}
+
+# Proses Inferensi
+INFERENCE_PROCESSES = int(os.environ.get('INFERENCE_PROCESSES', 0))   # 0 = inferensi di proses web
+INFERENCE_PROCESS_TIMEOUT = 30                                        # detik
+
+inference_local = threading.local()
+inference_processes = []
+
+# Rekam Sesi Live (untuk replay)
+SESSION_CAPTURE_DIR = os.environ.get('SESSION_CAPTURE_DIR')   # kosong = tidak merekam
+session_capture_lock = threading.Lock()
+session_capture = {
+    'file': None,
+    'path': None,
+    'start': None
+}
+
+# Penyimpanan Sesi (SQLite WAL)
+SESSION_STORE_PATH = os.environ.get('SESSION_STORE_PATH', '/tmp/sessions.db')   # kosong = tanpa penyimpanan
+SESSION_STORE_FLUSH_INTERVAL = 0.5       # detik maksimal event menunggu ditulis
+SESSION_STORE_BATCH_SIZE = 500           # event per transaksi
+SESSION_STORE_MAX_BACKLOG = 2000         # frame rekaman dilewati jika antrian melebihi ini
+SESSION_STORE_CHECKPOINT_SECONDS = 1.0   # interval minimal checkpoint statistik sesi
+SESSION_STORE_FRAME_QUALITY = 80         # kualitas JPEG frame rekaman yang disimpan
+SESSION_RECOVERY_MAX_AGE = 300           # detik, sesi aktif lebih lama dari ini dianggap ditinggalkan
+ANALYTICS_MAX_DAYS = 366                 # rentang maksimal query analitik
+ANALYTICS_MAX_ROWS = 1000                # batas atas ?top= dan ?limit= analitik
+ANALYTICS_GROUPS = {
+    'day': "session_date",
+    'week': "strftime('%Y-W%W', session_date)",
+    'month': "substr(session_date, 1, 7)",
+    'user': "COALESCE(user_label, '')"
+}
+SESSION_STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    start_time REAL NOT NULL,
+    end_time REAL,
+    updated REAL NOT NULL,
+    focus_statistics TEXT NOT NULL,
+    state TEXT NOT NULL,
+    recording_path TEXT,
+    report_path TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_status ON sessions(status, updated);
+CREATE TABLE IF NOT EXISTS session_alerts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    t REAL NOT NULL,
+    detection TEXT NOT NULL,
+    duration REAL NOT NULL,
+    is_reminder INTEGER NOT NULL,
+    alert TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_session_alerts_session ON session_alerts(session_id, id);
+CREATE TABLE IF NOT EXISTS session_timeline (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    t REAL NOT NULL,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_session_timeline_session ON session_timeline(session_id, t);
+CREATE TABLE IF NOT EXISTS session_frames (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    t REAL NOT NULL,
+    jpeg BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_session_frames_session ON session_frames(session_id, id);
+CREATE TABLE IF NOT EXISTS session_history (
+    session_id TEXT PRIMARY KEY,
+    user_label TEXT,
+    session_date TEXT NOT NULL,
+    start_time REAL NOT NULL,
+    end_time REAL NOT NULL,
+    duration REAL NOT NULL,
+    focused_time REAL NOT NULL,
+    unfocused_time REAL NOT NULL,
+    yawning_time REAL NOT NULL,
+    sleeping_time REAL NOT NULL,
+    no_person_time REAL NOT NULL,
+    alert_count INTEGER NOT NULL,
+    total_detections INTEGER NOT NULL,
+    frames_processed INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_session_history_date ON session_history(session_date);
+CREATE INDEX IF NOT EXISTS idx_session_history_user ON session_history(user_label, session_date);
+CREATE INDEX IF NOT EXISTS idx_session_alerts_time ON session_alerts(t, detection);
+CREATE TABLE IF NOT EXISTS live_state (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+session_store_queue = queue.Queue()
+session_store_state = {
+    'writer': None,
+    'writer_pid': None,
+    'recovered_pid': None,
+    'recovered_session': None,
+    'last_checkpoint': 0,
+    'events_written': 0,
+    'frames_skipped': 0,
+    'last_error': None
+}
+
+# Backend Sesi Live
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'memory')   # memory = satu worker, sqlite = dibagi antar worker
+NODE_ID = os.environ.get('NODE_ID') or socket.gethostname()
+SESSION_AFFINITY_COOKIE = 'sfa_node'
+SESSION_AFFINITY_HEADER = 'X-Session-Affinity'
+SHARED_RECENT_DETECTIONS = 10      # deteksi terakhir yang dibagi antar worker
+SHARED_FRAME_WAIT_SECONDS = 3.0    # tunggu frame rekaman worker lain saat sesi dihentikan
+LIVE_SESSION_ENDPOINTS = {'start_monitoring', 'stop_monitoring', 'process_frame', 'sync_alerts',
+                          'get_monitoring_data', 'monitoring_status'}
+live_session_lock = threading.RLock()
+live_session_local = threading.local()
+
+# Timing Tahap
+stage_timing_local = threading.local()   # akumulator timing per thread (None = tidak diukur)
+stage_timing_lock = threading.Lock()
+
+# Metrik (format teks Prometheus)
+METRIC_STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)   # detik
+FOLDER_USAGE_CACHE_SECONDS = 30
+metrics_lock = threading.Lock()
+stage_histograms = {}
+metric_counters = {
+    'frames_processed': 0,
+    'frames_dropped': 0,
+    'frames_reused': 0,
+    'alerts': {}
+}
+folder_usage_cache = {'updated': 0, 'usage': {}}
+
+# Server-Timing per request
+TIMED_ENDPOINTS = {'process_frame', 'upload', 'api_detect', 'api_detect_batch'}
+
+# Profiling Admin
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')   # kosong = endpoint admin nonaktif
+PROFILE_SAMPLE_INTERVAL = 0.01                # detik antar sampel stack
+PROFILE_MAX_SECONDS = 300
+TRACEMALLOC_FRAMES = 10
+PROFILE_IDLE_FRAMES = {
+    ('threading.py', 'wait'), ('selectors.py', 'select'), ('socketserver.py', 'serve_forever'),
+    ('queue.py', 'get'), ('connection.py', 'poll'), ('connection.py', '_recv_bytes'), ('socket.py', 'readinto')
+}
+profiler_lock = threading.Lock()
+profiler_state = {
+    'running': False,
+    'thread': None,
+    'started': None,
+    'stopped': None,
+    'deadline': None,
+    'requests_left': None,
+    'sample_count': 0,
+    'stacks': {},
+    'include_idle': False
+}
+
+# Warm-up Worker
+WARMUP_FRAME_SIZE = (640, 480)
+worker_readiness = {
+    'pid': None,       # proses yang sudah memulai warm-up
+    'started': None
+}
+
+# Snapshot Status (dibaca probe tanpa lock, diganti utuh oleh publish_worker_status)
+PROBE_ENDPOINTS = {'liveness', 'readiness', 'health_check'}
+worker_status_lock = threading.Lock()   # hanya antar penulis snapshot
+worker_status = MappingProxyType({
+    'pid': os.getpid(),
+    'started': time.time(),
+    'updated': time.time(),
+    'ready': False,
+    'warmup_ms': None,
+    'warmup_error': None,
+    'monitoring_active': False,
+    'session_id': None
+})
+
+# Snapshot Monitoring (dibangun jalur frame, dibaca endpoint polling tanpa lock)
+MONITORING_RECENT_ALERTS = 5
+monitoring_snapshot = None
+
+# MediaPipe
+face_detection = None
+face_mesh = None
+face_mesh_lite = None
+
+def init_mediapipe():
+    """Initialize MediaPipe"""
+    global face_detection, face_mesh
+    try:
+        face_detection = mp.solutions.face_detection.FaceDetection(
+            model_selection=1,
+            min_detection_confidence=0.5
+        )
+        face_mesh = mp.solutions.face_mesh.FaceMesh(
+            static_image_mode=False,
+            max_num_faces=8,  # Allow multiple faces for upload mode
+            refine_landmarks=True,
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5
+        )
+        logger.info("MediaPipe initialized successfully")
+        return True
+    except Exception as e:
+        logger.error(f"MediaPipe initialization failed: {str(e)}")
+        return False
+
+def get_face_mesh(refine_landmarks=True):
+    """Face mesh instance for the requested refinement (iris landmarks)"""
+    global face_mesh_lite
+    
+    if refine_landmarks:
+        return face_mesh
+    
+    if face_mesh_lite is None:
+        face_mesh_lite = mp.solutions.face_mesh.FaceMesh(
+            static_image_mode=False,
+            max_num_faces=8,
+            refine_landmarks=False,
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5
+        )
+    return face_mesh_lite
+
+def get_quality_settings():
+    """Quality knobs for the current degradation level"""
+    return DEGRADATION_LEVELS[degradation_state['level']]
+
+def record_inference_time(inference_ms):
+    """Feed measured inference time and queue depth into the degradation controller"""
+    with admission_condition:
+        frames_waiting = frame_admission['pending_ticket'] is not None
+    
+    with degradation_lock:
+        if degradation_state['avg_inference_ms'] > 0:
+            degradation_state['avg_inference_ms'] += PROCESSING_TIME_SMOOTHING * (
+                inference_ms - degradation_state['avg_inference_ms'])
+        else:
+            degradation_state['avg_inference_ms'] = inference_ms
+        
+        current_time = time.time()
+        if degradation_state['pinned'] or current_time - degradation_state['last_change'] < DEGRADATION_MIN_DWELL:
+            return
+        
+        level = degradation_state['level']
+        avg_inference_ms = degradation_state['avg_inference_ms']
+        
+        if (avg_inference_ms > DEGRADATION_STEP_DOWN_MS or frames_waiting) and level < len(DEGRADATION_LEVELS) - 1:
+            new_level = level + 1
+        elif avg_inference_ms < DEGRADATION_STEP_UP_MS and not frames_waiting and level > 0:
+            new_level = level - 1
+        else:
+            return
+        
+        degradation_state['level'] = new_level
+        degradation_state['last_change'] = current_time
+        logger.info(f"Quality level {level} -> {new_level} (avg inference {avg_inference_ms:.0f}ms, "
+                    f"frames waiting: {frames_waiting})")
+
+def pin_quality(level=0):
+    """Hold the quality at one level and turn off adaptive degradation (offline tools, benchmarks, replays)"""
+    with degradation_lock:
+        degradation_state['level'] = level
+        degradation_state['pinned'] = True
+
+def get_degradation_status():
+    """Current degradation level and its settings"""
+    with degradation_lock:
+        return {
+            "level": degradation_state['level'],
+            "max_level": len(DEGRADATION_LEVELS) - 1,
+            "pinned": degradation_state['pinned'],
+            "avg_inference_ms": round(degradation_state['avg_inference_ms'], 1),
+            "settings": DEGRADATION_LEVELS[degradation_state['level']]
+        }
+
+def start_session_capture(session_id):
+    """Open a capture file for the new live session when SESSION_CAPTURE_DIR is set"""
+    if not SESSION_CAPTURE_DIR:
+        return
+    
+    with session_capture_lock:
+        if session_capture['file'] is not None:
+            session_capture['file'].close()
+        
+        os.makedirs(SESSION_CAPTURE_DIR, exist_ok=True)
+        capture_path = os.path.join(SESSION_CAPTURE_DIR,
+                                    f"capture_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.jsonl")
+        session_capture['file'] = open(capture_path, 'w')
+        session_capture['path'] = capture_path
+        session_capture['start'] = time.time()
+        
+        session_capture['file'].write(json.dumps({
+            "type": "start",
+            "session_id": session_id,
+            "started_at": datetime.now().isoformat(),
+            "thresholds": DISTRACTION_THRESHOLDS,
+            "alert_cooldown": ALERT_COOLDOWN
+        }) + "\n")
+    
+    logger.info(f"Capturing live session to {capture_path}")
+
+def capture_frame_request(arrival_time, frame_payload, latency_ms, detections=None, reused=False, dropped=False):
+    """Append one /process_frame payload with its arrival offset and outcome to the capture"""
+    with session_capture_lock:
+        if session_capture['file'] is None:
+            return
+        
+        session_capture['file'].write(json.dumps({
+            "type": "frame",
+            "t": round(arrival_time - session_capture['start'], 4),
+            "frame": frame_payload,
+            "latency_ms": round(latency_ms, 2),
+            "dropped": dropped,
+            "reused": reused,
+            "quality_level": degradation_state['level'],
+            "statuses": [detection['status'] for detection in detections or []]
+        }) + "\n")
+
+def finish_session_capture(alerts, focus_statistics):
+    """Write the session outcome (alerts, statistics) and close the capture"""
+    with session_capture_lock:
+        if session_capture['file'] is None:
+            return
+        
+        session_capture['file'].write(json.dumps({
+            "type": "stop",
+            "t": round(time.time() - session_capture['start'], 4),
+            "alerts": [{"detection": alert['detection'], "duration": alert['duration'],
+                        "is_reminder": alert['is_reminder']} for alert in alerts],
+            "focus_statistics": focus_statistics
+        }) + "\n")
+        session_capture['file'].close()
+        session_capture['file'] = None
+        logger.info(f"Live session capture saved: {session_capture['path']}")
+
+def open_session_store(check_same_thread=True):
+    """SQLite connection to the session store, in WAL mode with the schema created"""
+    conn = sqlite3.connect(SESSION_STORE_PATH, timeout=10, check_same_thread=check_same_thread)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SESSION_STORE_SCHEMA)
+    return conn
+
+def ensure_session_store_writer():
+    """Start the store writer thread (also after a fork)"""
+    writer = session_store_state['writer']
+    if writer is not None and writer.is_alive() and session_store_state['writer_pid'] == os.getpid():
+        return
+    
+    writer = threading.Thread(target=session_store_writer_loop, name='session-store-writer', daemon=True)
+    session_store_state['writer'] = writer
+    session_store_state['writer_pid'] = os.getpid()
+    writer.start()
+
+def persist_session_event(kind, session_id, payload):
+    """Queue a session event for the store writer, never blocking the request"""
+    if not SESSION_STORE_PATH or not session_id:
+        return
+    
+    if kind == 'frame' and session_store_queue.qsize() > SESSION_STORE_MAX_BACKLOG:
+        session_store_state['frames_skipped'] += 1
+        return
+    
+    ensure_session_store_writer()
+    session_store_queue.put((kind, session_id, payload))
+
+def session_checkpoint():
+    """JSON-ready copy of the live session counters and state timers (caller holds monitoring_lock)"""
+    return {
+        'focus_statistics': dict(session_data['focus_statistics']),
+        'state': {
+            'user_label': session_data.get('user_label'),
+            'frame_counter': session_data.get('frame_counter', 0),
+            'total_frames_processed': session_data.get('total_frames_processed', 0),
+            'total_detections': session_data.get('detections_count', 0),
+            'client_alerts': session_data.get('client_alerts', []),
+            'no_person_state': dict(no_person_state),
+            'current_person_state': current_person_state,
+            'person_state_start_time': person_state_start_time,
+            'last_alert_times': dict(last_alert_times)
+        }
+    }
+
+def checkpoint_session(force=False):
+    """Persist the live session counters, at most every SESSION_STORE_CHECKPOINT_SECONDS"""
+    current_time = time.time()
+    if not force and current_time - session_store_state['last_checkpoint'] < SESSION_STORE_CHECKPOINT_SECONDS:
+        return
+    
+    with monitoring_lock:
+        if not session_data or not session_data.get('start_time'):
+            return
+        session_store_state['last_checkpoint'] = current_time
+        persist_session_event('checkpoint', session_data['session_id'], session_checkpoint())
+
+def session_history_record():
+    """Aggregates of the finished live session for the analytics history (caller holds monitoring_lock)"""
+    start_time = session_data['start_time'].timestamp()
+    end_time = session_data['end_time'].timestamp()
+    duration = max(0.0, end_time - start_time)
+    statistics = session_data['focus_statistics']
+    distraction_time = (statistics['total_unfocused_time'] + statistics['total_yawning_time'] +
+                        statistics['total_sleeping_time'] + statistics['total_no_person_time'])
+    
+    return {
+        'user_label': session_data.get('user_label'),
+        'session_date': session_data['start_time'].date().isoformat(),
+        'start_time': start_time,
+        'end_time': end_time,
+        'duration': duration,
+        'focused_time': max(0.0, duration - distraction_time),
+        'unfocused_time': statistics['total_unfocused_time'],
+        'yawning_time': statistics['total_yawning_time'],
+        'sleeping_time': statistics['total_sleeping_time'],
+        'no_person_time': statistics['total_no_person_time'],
+        'alert_count': len(session_data['alerts']),
+        'total_detections': statistics['total_detections'],
+        'frames_processed': session_data.get('total_frames_processed', 0)
+    }
+
+def store_state_change(status, t):
+    """Append a status transition of the live session to the state timeline"""
+    if live_monitoring_active and session_data.get('start_time'):
+        persist_session_event('state', session_data['session_id'], {'t': t, 'status': status})
+
+def write_session_events(conn, events):
+    """Write one batch of events in a single transaction"""
+    checkpoints = {}
+    trimmed_sessions = set()
+    
+    with conn:
+        for kind, session_id, payload in events:
+            if kind == 'start':
+                conn.execute(
+                    "INSERT OR REPLACE INTO sessions (session_id, status, start_time, updated, focus_statistics, state) "
+                    "VALUES (?, 'active', ?, ?, ?, ?)",
+                    (session_id, payload['start_time'], payload['start_time'],
+                     json.dumps(payload['focus_statistics']), json.dumps(payload['state'])))
+                # Sisa sesi lama dengan id yang sama; event worker lain mungkin sudah tertulis lebih dulu
+                for table in ('session_alerts', 'session_timeline', 'session_frames'):
+                    conn.execute(f"DELETE FROM {table} WHERE session_id = ? AND t < ?",
+                                 (session_id, payload['start_time']))
+            elif kind == 'checkpoint':
+                # Hanya checkpoint terakhir per sesi yang perlu ditulis
+                checkpoints[session_id] = payload
+            elif kind == 'alert':
+                conn.execute(
+                    "INSERT INTO session_alerts (session_id, t, detection, duration, is_reminder, alert) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (session_id, payload['t'], payload['alert']['detection'], payload['alert']['real_time_duration'],
+                     int(payload['alert']['is_reminder']), json.dumps(payload['alert'])))
+            elif kind == 'state':
+                conn.execute("INSERT INTO session_timeline (session_id, t, status) VALUES (?, ?, ?)",
+                             (session_id, payload['t'], payload['status']))
+            elif kind == 'frame':
+                ok, buffer = cv.imencode('.jpg', payload['frame'], [cv.IMWRITE_JPEG_QUALITY, SESSION_STORE_FRAME_QUALITY])
+                if ok:
+                    conn.execute("INSERT INTO session_frames (session_id, t, jpeg) VALUES (?, ?, ?)",
+                                 (session_id, payload['t'], buffer.tobytes()))
+                    trimmed_sessions.add(session_id)
+            elif kind == 'abandon':
+                conn.execute("UPDATE sessions SET status = 'abandoned', end_time = updated "
+                             "WHERE session_id = ? AND status = 'active'", (session_id,))
+                conn.execute("DELETE FROM session_frames WHERE session_id = ?", (session_id,))
+            elif kind == 'finish':
+                checkpoints.pop(session_id, None)
+                # Rekaman sudah dibuat, frame hanya diperlukan untuk pemulihan sesi aktif
+                conn.execute("DELETE FROM session_frames WHERE session_id = ?", (session_id,))
+                conn.execute(
+                    "UPDATE sessions SET status = 'finished', end_time = ?, updated = ?, focus_statistics = ?, state = ?, "
+                    "recording_path = ?, report_path = ? WHERE session_id = ?",
+                    (payload['end_time'], payload['end_time'], json.dumps(payload['focus_statistics']),
+                     json.dumps(payload['state']), payload.get('recording_path'), payload.get('report_path'), session_id))
+                
+                history = payload['history']
+                conn.execute(
+                    "INSERT OR REPLACE INTO session_history (session_id, user_label, session_date, start_time, end_time, "
+                    "duration, focused_time, unfocused_time, yawning_time, sleeping_time, no_person_time, alert_count, "
+                    "total_detections, frames_processed) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (session_id, history['user_label'], history['session_date'], history['start_time'],
+                     history['end_time'], history['duration'], history['focused_time'], history['unfocused_time'],
+                     history['yawning_time'], history['sleeping_time'], history['no_person_time'],
+                     history['alert_count'], history['total_detections'], history['frames_processed']))
+        
+        for session_id, payload in checkpoints.items():
+            conn.execute(
+                "UPDATE sessions SET updated = ?, focus_statistics = ?, state = ? WHERE session_id = ? AND status = 'active'",
+                (time.time(), json.dumps(payload['focus_statistics']), json.dumps(payload['state']), session_id))
+        
+        for session_id in trimmed_sessions:
+            conn.execute(
+                "DELETE FROM session_frames WHERE session_id = ? AND id <= "
+                "(SELECT id FROM session_frames WHERE session_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (session_id, session_id, MAX_STORED_FRAMES))
+
+def session_store_writer_loop():
+    """Store writer thread: drains the event queue in batched transactions"""
+    conn = None
+    
+    while True:
+        events = [session_store_queue.get()]
+        deadline = time.time() + SESSION_STORE_FLUSH_INTERVAL
+        
+        # Kumpulkan event hingga batch penuh, interval habis atau ada permintaan flush
+        while len(events) < SESSION_STORE_BATCH_SIZE and events[-1][0] != 'flush':
+            try:
+                events.append(session_store_queue.get(timeout=max(0, deadline - time.time())))
+            except queue.Empty:
+                break
+        
+        flush_events = [payload for kind, _, payload in events if kind == 'flush']
+        events = [event for event in events if event[0] != 'flush']
+        
+        try:
+            if conn is None:
+                conn = open_session_store()
+            write_session_events(conn, events)
+            session_store_state['events_written'] += len(events)
+        except Exception as e:
+            session_store_state['last_error'] = str(e)
+            logger.error(f"Session store write error: {str(e)}")
+        
+        for flushed in flush_events:
+            flushed.set()
+
+def flush_session_store(timeout=5.0):
+    """Wait until every queued event has been written"""
+    writer = session_store_state['writer']
+    if not SESSION_STORE_PATH or writer is None or not writer.is_alive():
+        return True
+    
+    flushed = threading.Event()
+    session_store_queue.put(('flush', None, flushed))
+    return flushed.wait(timeout)
+
+@atexit.register
+def close_session_store():
+    """Write pending session events on interpreter exit"""
+    flush_session_store(timeout=2.0)
+
+def query_session_store(sql, params=()):
+    """Rows of a read-only query on the session store"""
+    conn = open_session_store()
+    try:
+        conn.row_factory = sqlite3.Row
+        return [dict(row) for row in conn.execute(sql, params)]
+    finally:
+        conn.close()
+
+def analytics_filters(args):
+    """WHERE clause and parameters on session_history from ?from=, ?to=, ?days= and ?user="""
+    today = datetime.now().date()
+    try:
+        date_to = datetime.strptime(args['to'], '%Y-%m-%d').date() if args.get('to') else today
+        if args.get('from'):
+            date_from = datetime.strptime(args['from'], '%Y-%m-%d').date()
+        else:
+            date_from = date_to - timedelta(days=int(args.get('days', 30)) - 1)
+    except ValueError:
+        raise ValueError("from/to must be YYYY-MM-DD and days an integer")
+    
+    if date_from > date_to or (date_to - date_from).days >= ANALYTICS_MAX_DAYS:
+        raise ValueError(f"Date range must be 1 to {ANALYTICS_MAX_DAYS} days")
+    
+    clauses = ["session_date BETWEEN ? AND ?"]
+    params = [date_from.isoformat(), date_to.isoformat()]
+    if args.get('user'):
+        clauses.append("user_label = ?")
+        params.append(args['user'])
+    
+    return " AND ".join(clauses), params, {"from": date_from.isoformat(), "to": date_to.isoformat(),
+                                           "user": args.get('user')}
+
+def analytics_limit(args, name, default):
+    """Row limit from ?<name>=, clamped to 1..ANALYTICS_MAX_ROWS"""
+    try:
+        limit = int(args.get(name, default))
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+    return min(max(limit, 1), ANALYTICS_MAX_ROWS)
+
+def get_session_analytics(args):
+    """Focus trends per group and top alert types over finished sessions"""
+    where, params, query_range = analytics_filters(args)
+    top = analytics_limit(args, 'top', 5)
+    group = args.get('group', 'day')
+    if group not in ANALYTICS_GROUPS:
+        raise ValueError(f"group must be one of: {', '.join(ANALYTICS_GROUPS)}")
+    
+    aggregates = (
+        "COUNT(*) AS sessions, SUM(duration) AS duration, SUM(focused_time) AS focused_time, "
+        "SUM(unfocused_time) AS unfocused_time, SUM(yawning_time) AS yawning_time, "
+        "SUM(sleeping_time) AS sleeping_time, SUM(no_person_time) AS no_person_time, "
+        "SUM(alert_count) AS alerts, SUM(total_detections) AS detections"
+    )
+    
+    def with_focus_ratio(row):
+        row['focus_ratio'] = round(row['focused_time'] / row['duration'], 4) if row['duration'] else None
+        return row
+    
+    groups = query_session_store(
+        f"SELECT {ANALYTICS_GROUPS[group]} AS period, {aggregates} FROM session_history "
+        f"WHERE {where} GROUP BY period ORDER BY period", params)
+    totals = query_session_store(f"SELECT {aggregates} FROM session_history WHERE {where}", params)[0]
+    
+    top_alerts = query_session_store(
+        "SELECT detection, COUNT(*) AS count, SUM(is_reminder) AS reminders, AVG(duration) AS mean_duration "
+        "FROM session_alerts WHERE session_id IN (SELECT session_id FROM session_history WHERE "
+        f"{where}) GROUP BY detection ORDER BY count DESC LIMIT ?", params + [top])
+    
+    return {
+        "range": query_range,
+        "group": group,
+        "totals": with_focus_ratio(totals) if totals['sessions'] else {"sessions": 0},
+        "periods": [with_focus_ratio(row) for row in groups],
+        "top_alerts": top_alerts
+    }
+
+def get_session_store_status():
+    return {
+        "enabled": bool(SESSION_STORE_PATH),
+        "path": SESSION_STORE_PATH or None,
+        "backlog": session_store_queue.qsize(),
+        "events_written": session_store_state['events_written'],
+        "frames_skipped": session_store_state['frames_skipped'],
+        "last_error": session_store_state['last_error']
+    }
+
+def load_stored_frames(conn, session_id):
+    """Decoded recording frames of a session and their timestamps, oldest first"""
+    rows = conn.execute("SELECT t, jpeg FROM session_frames WHERE session_id = ? ORDER BY t DESC LIMIT ?",
+                        (session_id, MAX_STORED_FRAMES)).fetchall()
+    
+    recording_frames = []
+    frame_timestamps = []
+    for t, jpeg in reversed(rows):
+        frame = cv.imdecode(np.frombuffer(jpeg, np.uint8), cv.IMREAD_COLOR)
+        if frame is not None:
+            recording_frames.append(frame)
+            frame_timestamps.append(t)
+    return recording_frames, frame_timestamps
+
+def recover_live_session():
+    """Resume an in-progress session from the store in a fresh worker process"""
+    global session_data, no_person_state, live_monitoring_active, recording_active
+    global current_person_state, person_state_start_time, last_alert_times, session_start_time
+    
+    if session_store_state['recovered_pid'] == os.getpid():
+        return
+    session_store_state['recovered_pid'] = os.getpid()
+    
+    if not SESSION_STORE_PATH or live_monitoring_active or session_backend.shared:
+        return
+    
+    try:
+        conn = open_session_store()
+        try:
+            current_time = time.time()
+            # Sesi aktif yang tidak diperbarui terlalu lama ditutup
+            with conn:
+                conn.execute("UPDATE sessions SET status = 'abandoned', end_time = updated "
+                             "WHERE status = 'active' AND updated < ?", (current_time - SESSION_RECOVERY_MAX_AGE,))
+                conn.execute("DELETE FROM session_frames WHERE session_id IN "
+                             "(SELECT session_id FROM sessions WHERE status != 'active')")
+            
+            row = conn.execute("SELECT session_id, start_time, focus_statistics, state FROM sessions "
+                               "WHERE status = 'active' ORDER BY updated DESC LIMIT 1").fetchone()
+            if row is None:
+                return
+            
+            session_id, start_time, focus_statistics, state = row
+            state = json.loads(state)
+            alerts = [json.loads(alert) for (alert,) in conn.execute(
+                "SELECT alert FROM session_alerts WHERE session_id = ? ORDER BY id", (session_id,))]
+            recording_frames, frame_timestamps = load_stored_frames(conn, session_id)
+        finally:
+            conn.close()
+        
+        with monitoring_lock:
+            session_data = {
+                'start_time': datetime.fromtimestamp(start_time),
+                'end_time': None,
+                'detections': [],
+                'alerts': alerts,
+                'focus_statistics': json.loads(focus_statistics),
+                'recording_path': None,
+                'recording_frames': recording_frames,
+                'session_id': session_id,
+                'client_alerts': state.get('client_alerts', []),
+                'frame_counter': state.get('frame_counter', 0),
+                'frame_timestamps': frame_timestamps,
+                'total_frames_processed': state.get('total_frames_processed', 0),
+                'frames_recorded': len(recording_frames),
+                'detections_count': state.get('total_detections', 0),
+                'user_label': state.get('user_label')
+            }
+            no_person_state = state['no_person_state']
+            current_person_state = state.get('current_person_state')
+            person_state_start_time = state.get('person_state_start_time')
+            last_alert_times = state.get('last_alert_times', {})
+            session_start_time = start_time
+            
+            reset_frame_change_state()
+            reset_frame_admission()
+            live_monitoring_active = True
+            recording_active = True
+            session_store_state['recovered_session'] = session_id
+            publish_session_status()
+        
+        logger.info(f"Recovered live session {session_id}: {len(alerts)} alerts, {len(recording_frames)} frames")
+    except Exception as e:
+        session_store_state['last_error'] = str(e)
+        logger.error(f"Session recovery error: {str(e)}")
+
+class InProcessSessionBackend:
+    """Live session state kept in this process's globals, for a single worker"""
+    name = 'memory'
+    shared = False
+    
+    def acquire(self):
+        """Lock the live session against other workers"""
+    
+    def release(self):
+        """Unlock the live session"""
+    
+    def load(self):
+        """Shared state written by another worker since the last load or save, else None"""
+        return None
+    
+    def save(self, state):
+        """Publish this worker's state to the other workers"""
+    
+    def state_age(self):
+        """Seconds since the shared state was last saved by any worker"""
+        return 0
+    
+    def read_snapshot(self):
+        """Monitoring snapshot of the last saved state, read without the lock"""
+        return None
+    
+    def reset_after_fork(self):
+        """Drop connections and locks inherited from the parent process"""
+
+class SQLiteSessionBackend(InProcessSessionBackend):
+    """Live session state shared by the workers of one node through the session store
+    
+    A file lock serialises the live requests of all workers; the state is a
+    single versioned row, so a worker only reloads it after another worker
+    changed it. A Redis backend would implement the same four methods.
+    """
+    name = 'sqlite'
+    shared = True
+    
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = path + '.lock'
+        self.pid = None
+        self.conn = None
+        self.lock_file = None
+        self.version = None
+        self.serialized = None
+        self.updated = None
+        self.reader = None
+        self.reader_lock = threading.Lock()
+        self.cached_snapshot = None
+    
+    def connect(self):
+        # Koneksi dan file lock tidak dipakai ulang setelah fork
+        if self.pid != os.getpid():
+            self.conn = open_session_store(check_same_thread=False)
+            self.lock_file = open(self.lock_path, 'a')
+            self.pid = os.getpid()
+            self.version = None
+            self.serialized = None
+            self.updated = None
+    
+    def acquire(self):
+        self.connect()
+        fcntl.flock(self.lock_file, fcntl.LOCK_EX)
+    
+    def release(self):
+        fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+    
+    def load(self):
+        row = self.conn.execute("SELECT version, updated FROM live_state WHERE id = 1").fetchone()
+        if row is None:
+            return None
+        self.updated = row[1]
+        if row[0] == self.version:
+            return None
+        self.version, self.serialized = self.conn.execute("SELECT version, state FROM live_state WHERE id = 1").fetchone()
+        return json.loads(self.serialized)
+    
+    def save(self, state):
+        serialized = json.dumps(state)
+        if serialized == self.serialized:
+            return
+        
+        version = (self.version or 0) + 1
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO live_state (id, version, state, updated) VALUES (1, ?, ?, ?)",
+                              (version, serialized, time.time()))
+        self.version, self.serialized, self.updated = version, serialized, time.time()
+    
+    def state_age(self):
+        return time.time() - self.updated if self.updated else 0
+    
+    def read_snapshot(self):
+        # Satu koneksi baca-saja per proses, tanpa skrip skema; pembaca WAL tidak menunggu penulis
+        with self.reader_lock:
+            try:
+                if self.reader is None:
+                    self.reader = sqlite3.connect(f"file:{quote(self.path)}?mode=ro", uri=True, timeout=10,
+                                                  check_same_thread=False)
+                row = self.reader.execute("SELECT version FROM live_state WHERE id = 1").fetchone()
+            except sqlite3.OperationalError:
+                # Store atau tabel live_state belum dibuat oleh worker mana pun
+                return None
+            if row is None:
+                return None
+            
+            # State hanya di-parse saat versinya berubah
+            cached = self.cached_snapshot
+            if cached is None or cached[0] != row[0]:
+                version, serialized = self.reader.execute("SELECT version, state FROM live_state WHERE id = 1").fetchone()
+                monitoring = json.loads(serialized).get('monitoring')
+                cached = self.cached_snapshot = (version, MappingProxyType(monitoring) if monitoring else None)
+            return cached[1]
+    
+    def reset_after_fork(self):
+        self.reader = None
+        self.reader_lock = threading.Lock()
+
+def create_session_backend(name):
+    if name == 'sqlite':
+        if SESSION_STORE_PATH:
+            return SQLiteSessionBackend(SESSION_STORE_PATH)
+        logger.warning("SESSION_BACKEND=sqlite needs SESSION_STORE_PATH, using the in-process backend")
+    elif name != 'memory':
+        logger.warning(f"Unknown SESSION_BACKEND {name}, using the in-process backend")
+    return InProcessSessionBackend()
+
+session_backend = create_session_backend(SESSION_BACKEND)
+
+def live_state_snapshot():
+    """JSON-ready live session state shared between workers (caller holds monitoring_lock)"""
+    shared_session = {key: value for key, value in session_data.items()
+                      if key not in ('recording_frames', 'frame_timestamps', 'detections')}
+    shared_session['detections'] = session_data.get('detections', [])[-SHARED_RECENT_DETECTIONS:]
+    for key in ('start_time', 'end_time'):
+        shared_session[key] = session_data[key].timestamp() if session_data.get(key) else None
+    
+    return {
+        'monitoring': dict(monitoring_snapshot) if monitoring_snapshot else None,
+        'session_data': shared_session,
+        'no_person_state': no_person_state,
+        'current_person_state': current_person_state,
+        'person_state_start_time': person_state_start_time,
+        'last_alert_times': last_alert_times,
+        'session_start_time': session_start_time,
+        'live_monitoring_active': live_monitoring_active,
+        'recording_active': recording_active
+    }
+
+def apply_live_state(state):
+    """Replace this worker's live session globals with the shared state (caller holds monitoring_lock)"""
+    global session_data, no_person_state, live_monitoring_active, recording_active
+    global current_person_state, person_state_start_time, last_alert_times, session_start_time
+    
+    shared_session = dict(state['session_data'])
+    for key in ('start_time', 'end_time'):
+        shared_session[key] = datetime.fromtimestamp(shared_session[key]) if shared_session[key] else None
+    
+    if session_data.get('session_id') == shared_session['session_id']:
+        # Frame rekaman worker ini tetap disimpan lokal
+        shared_session['recording_frames'] = session_data.get('recording_frames', [])
+        shared_session['frame_timestamps'] = session_data.get('frame_timestamps', [])
+    else:
+        shared_session['recording_frames'] = []
+        shared_session['frame_timestamps'] = []
+        reset_frame_change_state()
+    
+    session_data = shared_session
+    no_person_state = state['no_person_state']
+    current_person_state = state['current_person_state']
+    person_state_start_time = state['person_state_start_time']
+    last_alert_times = state['last_alert_times']
+    session_start_time = state['session_start_time']
+    live_monitoring_active = state['live_monitoring_active']
+    recording_active = state['recording_active']
+    publish_session_status()
+
+def acquire_live_session():
+    """Enter the live session; with a shared backend, lock it across workers and load its latest state"""
+    if not session_backend.shared:
+        return
+    
+    stage_start = time.perf_counter()
+    live_session_lock.acquire()
+    depth = getattr(live_session_local, 'depth', 0)
+    live_session_local.depth = depth + 1
+    if depth:
+        return
+    
+    try:
+        session_backend.acquire()
+        record_stage('lock_wait', stage_start)
+        try:
+            state = session_backend.load()
+            with monitoring_lock:
+                if state is not None:
+                    apply_live_state(state)
+                if live_monitoring_active and session_backend.state_age() > SESSION_RECOVERY_MAX_AGE:
+                    expire_live_session()
+        except Exception:
+            session_backend.release()
+            raise
+    except Exception:
+        live_session_local.depth = 0
+        live_session_lock.release()
+        raise
+
+def expire_live_session():
+    """Abandon a shared session no worker has updated for SESSION_RECOVERY_MAX_AGE (caller holds monitoring_lock)"""
+    global live_monitoring_active, recording_active
+    
+    # Tab ditutup atau worker mati di tengah sesi; sesi baru boleh dimulai
+    persist_session_event('abandon', session_data.get('session_id'), None)
+    logger.info(f"Shared session {session_data.get('session_id')} abandoned after "
+                f"{session_backend.state_age():.0f}s without updates")
+    live_monitoring_active = False
+    recording_active = False
+    publish_session_status()
+
+def release_live_session():
+    """Leave the live session, publishing this worker's changes to the others"""
+    if not session_backend.shared or not getattr(live_session_local, 'depth', 0):
+        return
+    
+    live_session_local.depth -= 1
+    try:
+        if live_session_local.depth == 0:
+            try:
+                with monitoring_lock:
+                    publish_monitoring_snapshot()
+                    state = live_state_snapshot()
+                session_backend.save(state)
+            finally:
+                session_backend.release()
+    finally:
+        live_session_lock.release()
+
+@contextmanager
+def live_session_scope():
+    """Exclusive access to the live session state (monitoring_lock with the in-process backend)"""
+    acquire_live_session()
+    try:
+        with monitoring_lock:
+            yield
+    finally:
+        release_live_session()
+
+def recorded_frame_count():
+    """Frames in the session recording, counted across workers with a shared backend"""
+    if session_backend.shared:
+        return session_data.get('frames_recorded', 0)
+    return len(session_data.get('recording_frames', []))
+
+def collect_shared_recording(session_id, expected_frames):
+    """Recording frames stored by every worker, once their store writers have caught up"""
+    flush_session_store()
+    deadline = time.time() + SHARED_FRAME_WAIT_SECONDS
+    
+    conn = open_session_store()
+    try:
+        while time.time() < deadline:
+            stored = conn.execute("SELECT COUNT(*) FROM session_frames WHERE session_id = ?",
+                                  (session_id,)).fetchone()[0]
+            if stored >= expected_frames:
+                break
+            time.sleep(SESSION_STORE_FLUSH_INTERVAL / 2)
+        return load_stored_frames(conn, session_id)
+    finally:
+        conn.close()
+
+def session_affinity_token(session_id):
+    """Token naming the node that serves a live session"""
+    return f"{NODE_ID}:{session_id}"
+
+def with_session_affinity(response, session_id):
+    """Add the affinity token and the node cookie (for sticky load balancers) to a start response"""
+    response.set_cookie(SESSION_AFFINITY_COOKIE, NODE_ID, httponly=True, samesite='Lax')
+    response.headers[SESSION_AFFINITY_HEADER] = session_affinity_token(session_id)
+    return response
+
+def start_stage_timing(timings=None):
+    """Collect per-stage timings of the calling thread into timings (stage -> [total_ms, count])"""
+    if timings is None:
+        timings = {}
+    stage_timing_local.timings = timings
+    return timings
+
+def stop_stage_timing():
+    """Stop collecting stage timings on the calling thread"""
+    stage_timing_local.timings = None
+
+def current_stage_timings():
+    """Stage timing accumulator of the calling thread, None if not measuring"""
+    return getattr(stage_timing_local, 'timings', None)
+
+def record_stage(stage, start):
+    """Add the time since start (time.perf_counter) to the stage histogram and the calling thread's timings"""
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    observe_stage(stage, elapsed_ms)
+    
+    timings = getattr(stage_timing_local, 'timings', None)
+    if timings is None:
+        return
+    
+    with stage_timing_lock:
+        entry = timings.setdefault(stage, [0.0, 0])
+        entry[0] += elapsed_ms
+        entry[1] += 1
+
+@contextmanager
+def timed_lock(lock, stage='lock_wait'):
+    """Acquire lock, recording the wait as a stage"""
+    stage_start = time.perf_counter()
+    with lock:
+        record_stage(stage, stage_start)
+        yield
+
+def format_server_timing(timings, total_ms):
+    """Server-Timing header value from a stage timing accumulator"""
+    entries = [f"{stage};dur={total:.1f}" for stage, (total, _) in sorted(timings.items(), key=lambda item: -item[1][0])]
+    entries.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(entries)
+
+def observe_stage(stage, elapsed_ms):
+    """Add one observation to the stage latency histogram"""
+    elapsed = elapsed_ms / 1000
+    with metrics_lock:
+        histogram = stage_histograms.get(stage)
+        if histogram is None:
+            histogram = stage_histograms[stage] = {'buckets': [0] * len(METRIC_STAGE_BUCKETS), 'sum': 0.0, 'count': 0}
+        
+        for bucket_idx, upper_bound in enumerate(METRIC_STAGE_BUCKETS):
+            if elapsed <= upper_bound:
+                histogram['buckets'][bucket_idx] += 1
+                break
+        histogram['sum'] += elapsed
+        histogram['count'] += 1
+
+def increment_counter(name, label=None):
+    """Increment a metric counter, optionally one labelled child (e.g. alert type)"""
+    with metrics_lock:
+        if label is None:
+            metric_counters[name] += 1
+        else:
+            metric_counters[name][label] = metric_counters[name].get(label, 0) + 1
+
+def get_folder_usage():
+    """Bytes and file counts of the data folders, cached for FOLDER_USAGE_CACHE_SECONDS"""
+    current_time = time.time()
+    if current_time - folder_usage_cache['updated'] < FOLDER_USAGE_CACHE_SECONDS:
+        return folder_usage_cache['usage']
+    
+    usage = {}
+    for name in ['UPLOAD_FOLDER', 'DETECTED_FOLDER', 'REPORTS_FOLDER', 'RECORDINGS_FOLDER']:
+        folder = application.config[name]
+        total_bytes = 0
+        total_files = 0
+        try:
+            for entry in os.scandir(folder):
+                if entry.is_file(follow_symlinks=False):
+                    total_bytes += entry.stat().st_size
+                    total_files += 1
+        except OSError:
+            pass
+        usage[name.split('_')[0].lower()] = (total_bytes, total_files)
+    
+    folder_usage_cache['usage'] = usage
+    folder_usage_cache['updated'] = current_time
+    return usage
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format
+    
+    Metrics are per process; every sample carries a pid label so that the
+    workers behind one scrape target stay apart (sum or max over pid).
+    """
+    lines = []
+    pid_label = f'pid="{os.getpid()}"'
+    
+    def metric_header(name, metric_type, help_text):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+    
+    def sample(name, value, labels=''):
+        lines.append(f'{name}{{{pid_label}{"," + labels if labels else ""}}} {value}')
+    
+    with metrics_lock:
+        histograms = {stage: {'buckets': list(histogram['buckets']), 'sum': histogram['sum'],
+                              'count': histogram['count']} for stage, histogram in stage_histograms.items()}
+        counters = {name: dict(value) if isinstance(value, dict) else value for name, value in metric_counters.items()}
+    
+    metric_header('smartfocus_stage_duration_seconds', 'histogram', 'Duration of pipeline stages')
+    for stage, histogram in sorted(histograms.items()):
+        cumulative = 0
+        for upper_bound, bucket_count in zip(METRIC_STAGE_BUCKETS, histogram['buckets']):
+            cumulative += bucket_count
+            sample('smartfocus_stage_duration_seconds_bucket', cumulative, f'stage="{stage}",le="{upper_bound}"')
+        sample('smartfocus_stage_duration_seconds_bucket', histogram['count'], f'stage="{stage}",le="+Inf"')
+        sample('smartfocus_stage_duration_seconds_sum', f"{histogram['sum']:.6f}", f'stage="{stage}"')
+        sample('smartfocus_stage_duration_seconds_count', histogram['count'], f'stage="{stage}"')
+    
+    for name, help_text in [('frames_processed', 'Live frames processed'),
+                            ('frames_dropped', 'Live frames dropped by admission control'),
+                            ('frames_reused', 'Live frames answered with reused detections')]:
+        metric_header(f'smartfocus_{name}_total', 'counter', help_text)
+        sample(f'smartfocus_{name}_total', counters[name])
+    
+    metric_header('smartfocus_alerts_total', 'counter', 'Alerts triggered by type')
+    for alert_type, count in sorted(counters['alerts'].items()):
+        sample('smartfocus_alerts_total', count, f'type="{alert_type}"')
+    
+    with monitoring_lock:
+        active_sessions = 1 if live_monitoring_active else 0
+        recording_frames = list(session_data.get('recording_frames', [])) if session_data else []
+    
+    metric_header('smartfocus_active_sessions', 'gauge', 'Live monitoring sessions in progress')
+    sample('smartfocus_active_sessions', active_sessions)
+    metric_header('smartfocus_recording_frames', 'gauge', 'Frames held in memory for the session recording')
+    sample('smartfocus_recording_frames', len(recording_frames))
+    metric_header('smartfocus_recording_frame_bytes', 'gauge', 'Memory used by stored recording frames')
+    sample('smartfocus_recording_frame_bytes', sum(frame.nbytes for frame in recording_frames))
+    
+    metric_header('smartfocus_quality_level', 'gauge', 'Current adaptive degradation level (0 = full quality)')
+    sample('smartfocus_quality_level', degradation_state["level"])
+    
+    scheduler_status = get_scheduler_status()
+    metric_header('smartfocus_inference_queue_depth', 'gauge', 'Inference tasks waiting by priority')
+    sample('smartfocus_inference_queue_depth', scheduler_status["live_queued"], 'priority="live"')
+    sample('smartfocus_inference_queue_depth', scheduler_status["upload_queued"], 'priority="upload"')
+    
+    folder_usage = get_folder_usage()
+    metric_header('smartfocus_folder_bytes', 'gauge', 'Disk usage of data folders')
+    for folder, (total_bytes, _) in sorted(folder_usage.items()):
+        sample('smartfocus_folder_bytes', total_bytes, f'folder="{folder}"')
+    metric_header('smartfocus_folder_files', 'gauge', 'Files in data folders')
+    for folder, (_, total_files) in sorted(folder_usage.items()):
+        sample('smartfocus_folder_files', total_files, f'folder="{folder}"')
+    
+    return "\n".join(lines) + "\n"
+
+def admin_required(view):
+    """Restrict a route to requests carrying ADMIN_TOKEN (X-Admin-Token header)"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({"error": "Not found"}), 404
+        token = request.headers.get('X-Admin-Token', '')
+        if not hmac.compare_digest(token, ADMIN_TOKEN):
+            return jsonify({"error": "Forbidden"}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+def collapse_stack(frame):
+    """file:function frames from the outermost call to frame, or None for an idle thread"""
+    code = frame.f_code
+    if (os.path.basename(code.co_filename), code.co_name) in PROFILE_IDLE_FRAMES and not profiler_state['include_idle']:
+        return None
+    
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+def profiler_loop():
+    """Sampling profiler thread: collects collapsed stacks of all other threads"""
+    own_id = threading.get_ident()
+    
+    while True:
+        with profiler_lock:
+            if not profiler_state['running']:
+                break
+            if profiler_state['deadline'] and time.time() >= profiler_state['deadline']:
+                profiler_state['running'] = False
+                profiler_state['stopped'] = time.time()
+                break
+        
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        samples = []
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            stack = collapse_stack(frame)
+            if stack:
+                samples.append(f"{thread_names.get(thread_id, thread_id)};{stack}")
+        
+        with profiler_lock:
+            profiler_state['sample_count'] += 1
+            for stack in samples:
+                profiler_state['stacks'][stack] = profiler_state['stacks'].get(stack, 0) + 1
+        
+        time.sleep(PROFILE_SAMPLE_INTERVAL)
+
+def start_profiler(seconds=None, requests_count=None, include_idle=False):
+    """Start sampling for a number of seconds or of the next requests"""
+    with profiler_lock:
+        if profiler_state['running']:
+            return False
+        
+        profiler_state.update({
+            'running': True,
+            'started': time.time(),
+            'stopped': None,
+            'deadline': time.time() + min(seconds or PROFILE_MAX_SECONDS, PROFILE_MAX_SECONDS),
+            'requests_left': requests_count,
+            'sample_count': 0,
+            'stacks': {},
+            'include_idle': include_idle
+        })
+        profiler_state['thread'] = threading.Thread(target=profiler_loop, name='profiler', daemon=True)
+        profiler_state['thread'].start()
+    return True
+
+def get_profiler_status():
+    with profiler_lock:
+        return {
+            "running": profiler_state['running'],
+            "started": datetime.fromtimestamp(profiler_state['started']).isoformat() if profiler_state['started'] else None,
+            "stopped": datetime.fromtimestamp(profiler_state['stopped']).isoformat() if profiler_state['stopped'] else None,
+            "requests_left": profiler_state['requests_left'],
+            "samples": profiler_state['sample_count'],
+            "unique_stacks": len(profiler_state['stacks'])
+        }
+
+def estimate_list_bytes(items, sample_size=50):
+    """Approximate memory of a list of small dicts/values from a sample of its items"""
+    if not items:
+        return sys.getsizeof(items)
+    
+    sample = items[:sample_size]
+    item_bytes = 0
+    for item in sample:
+        item_bytes += sys.getsizeof(item)
+        if isinstance(item, dict):
+            item_bytes += sum(sys.getsizeof(key) + sys.getsizeof(value) for key, value in item.items())
+    return sys.getsizeof(items) + int(item_bytes / len(sample) * len(items))
+
+def get_session_memory():
+    """Memory held by the live session state"""
+    with monitoring_lock:
+        recording_frames = list(session_data.get('recording_frames', [])) if session_data else []
+        sessions = []
+        if session_data:
+            sessions.append({
+                "session_id": session_data.get('session_id'),
+                "active": live_monitoring_active,
+                "recording_frames": len(recording_frames),
+                "recording_frame_bytes": sum(frame.nbytes for frame in recording_frames),
+                "frame_timestamps_bytes": estimate_list_bytes(session_data.get('frame_timestamps', [])),
+                "detections": session_data.get('detections_count', 0),
+                "detections_held": len(session_data.get('detections', [])),
+                "detections_bytes": estimate_list_bytes(session_data.get('detections', [])),
+                "alerts": len(session_data.get('alerts', [])),
+                "alerts_bytes": estimate_list_bytes(session_data.get('alerts', [])),
+                "client_alerts": len(session_data.get('client_alerts', [])),
+                "client_alerts_bytes": estimate_list_bytes(session_data.get('client_alerts', []))
+            })
+        last_frame = frame_change_state.get('last_processed_frame')
+    
+    rss_bytes = None
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    rss_bytes = int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    
+    return {
+        "process_rss_bytes": rss_bytes,
+        "sessions": sessions,
+        "frame_change_cache_bytes": last_frame.nbytes if last_frame is not None else 0
+    }
+
+def warm_up_models(frame):
+    """Build this worker's inference graphs and run every model variant once (inference thread)"""
+    if getattr(inference_local, 'worker', None) is None and (face_detection is None or face_mesh is None):
+        if not init_mediapipe():
+            raise RuntimeError("MediaPipe initialization failed")
+    
+    for refine_landmarks in sorted({level['refine_landmarks'] for level in DEGRADATION_LEVELS}, reverse=True):
+        run_face_models(frame, refine_landmarks)
 
-def init_mediapipe():
-    """Initialize MediaPipe"""
-    global face_detection, face_mesh
+def warm_up_worker():
+    """Warm-up inference on a synthetic frame; the worker reports ready afterwards"""
+    width, height = WARMUP_FRAME_SIZE
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    frame[:, :, 1] = np.linspace(0, 255, width, dtype=np.uint8)[None, :]
+    cv.circle(frame, (width // 2, height // 2), height // 4, (180, 200, 230), -1)
+    
+    worker_readiness['pid'] = os.getpid()
+    start = time.perf_counter()
     try:
-        face_detection = mp.solutions.face_detection.FaceDetection(
-            model_selection=1,
-            min_detection_confidence=0.5
-        )
-        face_mesh = mp.solutions.face_mesh.FaceMesh(
-            static_image_mode=False,
-            max_num_faces=8,  # Allow multiple faces for upload mode
-            refine_landmarks=True,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
-        logger.info("MediaPipe initialized successfully")
-        return True
+        # Satu task per thread inferensi agar setiap proses inferensi ikut dimuat
+        futures = [submit_inference(warm_up_models, frame) for _ in range(max(1, INFERENCE_PROCESSES))]
+        for future in futures:
+            future.result(timeout=INFERENCE_PROCESS_TIMEOUT * 2)
     except Exception as e:
-        logger.error(f"MediaPipe initialization failed: {str(e)}")
+        publish_worker_status(warmup_error=str(e))
+        logger.error(f"Worker warm-up failed: {str(e)}")
         return False
+    
+    warmup_ms = round((time.perf_counter() - start) * 1000, 1)
+    publish_worker_status(ready=True, warmup_ms=warmup_ms, warmup_error=None)
+    logger.info(f"Worker {os.getpid()} ready (warm-up {warmup_ms} ms)")
+    return True
+
+def start_worker_warmup():
+    """Start the warm-up of this worker process in the background (once per process)"""
+    if worker_readiness['pid'] == os.getpid():
+        return
+    
+    worker_readiness.update({'pid': os.getpid(), 'started': time.time()})
+    threading.Thread(target=warm_up_worker, name='worker-warmup', daemon=True).start()
+
+def publish_worker_status(**changes):
+    """Swap in a new status snapshot with the given fields changed (readers never lock)"""
+    global worker_status
+    
+    with worker_status_lock:
+        status = dict(worker_status, **changes)
+        status['updated'] = time.time()
+        worker_status = MappingProxyType(status)
+
+def publish_session_status():
+    """Publish the live session fields of the status and monitoring snapshots"""
+    publish_worker_status(monitoring_active=live_monitoring_active,
+                          session_id=session_data.get('session_id') if session_data else None)
+    publish_monitoring_snapshot()
+
+def format_monitoring_alert(alert):
+    """Dashboard entry for a stored alert"""
+    try:
+        alert_time = datetime.fromisoformat(alert['timestamp']).strftime('%H:%M:%S')
+    except (KeyError, ValueError):
+        alert_time = alert.get('alert_time', 'N/A')
+    
+    duration = alert.get('real_time_duration', alert.get('duration', 0))
+    duration_text = f" ({duration:.1f}s)" if duration > 0 else ""
+    
+    return {
+        'time': alert_time,
+        'message': alert['message'] + duration_text,
+        'type': 'warning' if alert['detection'] in ['YAWNING', 'NOT FOCUSED'] else 'error',
+        'duration': duration,
+        'is_reminder': alert.get('is_reminder', False)
+    }
+
+def build_monitoring_snapshot(previous):
+    """Immutable, pre-formatted view of the live session for the polling endpoints (caller holds monitoring_lock)"""
+    session_id = session_data.get('session_id') if session_data else None
+    alerts = session_data.get('alerts', []) if session_data else []
+    detections = session_data.get('detections', []) if session_data else []
+    
+    # Alert terformat dipakai ulang selama tidak ada alert baru
+    if previous is not None and previous['session_id'] == session_id and previous['alerts_count'] == len(alerts):
+        latest_alerts = previous['latest_alerts']
+    else:
+        latest_alerts = [format_monitoring_alert(alert) for alert in alerts[-MONITORING_RECENT_ALERTS:]]
+    
+    current_status = 'READY'
+    focused_count = 0
+    total_persons = 0
+    if detections:
+        current_status = detections[-1]['status']
+        total_persons = 1
+        focused_count = 1 if current_status == 'FOCUSED' else 0
+    elif no_person_state.get('active', False):
+        current_status = 'NO PERSON'
+    
+    frames_stored = recorded_frame_count() if session_data else 0
+    frames_processed = session_data.get('total_frames_processed', 0) if session_data else 0
+    
+    return MappingProxyType({
+        'session_id': session_id,
+        'active': live_monitoring_active,
+        'alerts_count': len(alerts),
+        'frames_stored': frames_stored,
+        'frames_processed': frames_processed,
+        'no_person_active': no_person_state.get('active', False),
+        'latest_alerts': latest_alerts,
+        # Body /get_monitoring_data siap kirim
+        'monitoring_data_json': application.json.dumps({
+            'total_persons': total_persons,
+            'focused_count': focused_count,
+            'alert_count': len(alerts),
+            'current_status': current_status,
+            'latest_alerts': latest_alerts,
+            'frame_count': frames_stored,
+            'total_processed': frames_processed
+        })
+    })
+
+def publish_monitoring_snapshot():
+    """Rebuild the monitoring snapshot and swap the reference read by the pollers"""
+    global monitoring_snapshot
+    
+    with monitoring_lock:
+        monitoring_snapshot = build_monitoring_snapshot(monitoring_snapshot)
+
+def current_monitoring_snapshot():
+    """Latest monitoring snapshot; with a shared backend, the one saved by whichever worker ran last"""
+    if session_backend.shared:
+        snapshot = session_backend.read_snapshot()
+        if snapshot is not None:
+            return snapshot
+    return monitoring_snapshot
+
+def reset_after_fork():
+    """Drop model graphs, threads and inference processes inherited from the parent process"""
+    global face_detection, face_mesh, face_mesh_lite, inference_condition, worker_status_lock
+    
+    face_detection = None
+    face_mesh = None
+    face_mesh_lite = None
+    
+    inference_condition = threading.Condition(threading.Lock())
+    inference_scheduler['threads'] = []
+    inference_scheduler['live_queue'] = deque()
+    inference_scheduler['upload_queues'] = OrderedDict()
+    inference_processes.clear()
+    
+    worker_readiness.update({'pid': None, 'started': None})
+    session_backend.reset_after_fork()
+    worker_status_lock = threading.Lock()
+    publish_worker_status(pid=os.getpid(), started=time.time(), ready=False, warmup_ms=None, warmup_error=None)
+
+os.register_at_fork(after_in_child=reset_after_fork)
+publish_monitoring_snapshot()
+
+def ensure_inference_worker():
+    """Start the inference worker threads, one per inference process (also after a fork)"""
+    threads = [thread for thread in inference_scheduler['threads'] if thread.is_alive()]
+    
+    for worker_idx in range(len(threads), max(1, INFERENCE_PROCESSES)):
+        thread = threading.Thread(target=inference_worker_loop, name=f'inference-worker-{worker_idx}', daemon=True)
+        threads.append(thread)
+        thread.start()
+    
+    inference_scheduler['threads'] = threads
+
+def submit_inference(func, *args, priority="live", job_id=None, **kwargs):
+    """Queue an inference call on the scheduler and return its Future"""
+    if threading.current_thread() in inference_scheduler['threads']:
+        future = Future()
+        try:
+            future.set_result(func(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+    
+    task = {
+        'func': func,
+        'args': args,
+        'kwargs': kwargs,
+        'priority': priority,
+        'enqueued_at': time.time(),
+        'timings': current_stage_timings(),
+        'future': Future()
+    }
+    
+    with inference_condition:
+        ensure_inference_worker()
+        if priority == "live":
+            inference_scheduler['live_queue'].append(task)
+        else:
+            inference_scheduler['upload_queues'].setdefault(job_id or 'default', deque()).append(task)
+        inference_condition.notify()
+    
+    return task['future']
+
+def run_inference(func, *args, priority="live", job_id=None, **kwargs):
+    """Run an inference call on the scheduler thread and wait for its result"""
+    return submit_inference(func, *args, priority=priority, job_id=job_id, **kwargs).result()
+
+def next_inference_task():
+    """Live frames first, then upload jobs round-robin (caller holds inference_condition)"""
+    if inference_scheduler['live_queue']:
+        return inference_scheduler['live_queue'].popleft()
+    
+    upload_queues = inference_scheduler['upload_queues']
+    if upload_queues:
+        job_id = next(iter(upload_queues))
+        job_queue = upload_queues[job_id]
+        task = job_queue.popleft()
+        
+        # Giliran berikutnya untuk job lain
+        if job_queue:
+            upload_queues.move_to_end(job_id)
+        else:
+            del upload_queues[job_id]
+        return task
+    
+    return None
+
+def inference_worker_loop():
+    """Inference worker thread, owns the MediaPipe graphs or one inference process"""
+    if INFERENCE_PROCESSES > 0:
+        inference_local.worker = start_inference_process()
+    
+    while True:
+        with inference_condition:
+            task = next_inference_task()
+            while task is None:
+                inference_condition.wait()
+                task = next_inference_task()
+            
+            wait_ms = (time.time() - task['enqueued_at']) * 1000
+            if task['priority'] == "live":
+                inference_scheduler['live_completed'] += 1
+                inference_scheduler['avg_live_wait_ms'] += PROCESSING_TIME_SMOOTHING * (
+                    wait_ms - inference_scheduler['avg_live_wait_ms'])
+                if wait_ms > LIVE_FRAME_SLO_MS:
+                    inference_scheduler['live_slo_misses'] += 1
+            else:
+                inference_scheduler['upload_completed'] += 1
+        
+        future = task['future']
+        if not future.set_running_or_notify_cancel():
+            continue
+        
+        # Timing tahap dicatat ke akumulator thread pemanggil
+        stage_timing_local.timings = task['timings']
+        observe_stage('queue_wait', wait_ms)
+        if task['timings'] is not None:
+            with stage_timing_lock:
+                entry = task['timings'].setdefault('queue_wait', [0.0, 0])
+                entry[0] += wait_ms
+                entry[1] += 1
+        try:
+            future.set_result(task['func'](*task['args'], **task['kwargs']))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            stage_timing_local.timings = None
+
+def extract_face_results(detection_results, mesh_results):
+    """Convert MediaPipe results into plain bounding boxes and normalized landmark arrays"""
+    faces = []
+    for detection in detection_results.detections or []:
+        bbox = detection.location_data.relative_bounding_box
+        faces.append((bbox.xmin, bbox.ymin, bbox.width, bbox.height, float(detection.score[0])))
+    
+    meshes = []
+    for face_landmarks in mesh_results.multi_face_landmarks or []:
+        meshes.append(np.array([(point.x, point.y) for point in face_landmarks.landmark], dtype=np.float32))
+    
+    return faces, meshes
+
+def run_face_models(image, refine_landmarks=True):
+    """Face detection and face mesh on a BGR image, in an inference process when configured"""
+    worker = getattr(inference_local, 'worker', None)
+    if worker is not None:
+        stage_start = time.perf_counter()
+        result = run_in_inference_process(worker, image, refine_landmarks)
+        record_stage('inference_process', stage_start)
+        return result
+    
+    stage_start = time.perf_counter()
+    rgb_image = cv.cvtColor(image, cv.COLOR_BGR2RGB)
+    record_stage('cvtColor', stage_start)
+    
+    stage_start = time.perf_counter()
+    detection_results = face_detection.process(rgb_image)
+    record_stage('face_detection', stage_start)
+    
+    stage_start = time.perf_counter()
+    mesh_results = get_face_mesh(refine_landmarks).process(rgb_image)
+    record_stage('face_mesh', stage_start)
+    return extract_face_results(detection_results, mesh_results)
+
+def inference_process_main(conn):
+    """Entry point of an inference process, reads frames from shared memory"""
+    if not init_mediapipe():
+        conn.send(('error', "MediaPipe initialization failed"))
+        return
+    conn.send(('ready', None))
+    
+    attached_memory = None
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        
+        memory_name, shape, refine_landmarks = message
+        
+        if attached_memory is None or attached_memory.name != memory_name:
+            if attached_memory is not None:
+                attached_memory.close()
+            attached_memory = shared_memory.SharedMemory(name=memory_name)
+        
+        rgb_image = np.ndarray(shape, dtype=np.uint8, buffer=attached_memory.buf)
+        try:
+            detection_results = face_detection.process(rgb_image)
+            mesh_results = get_face_mesh(refine_landmarks).process(rgb_image)
+            conn.send(('ok', extract_face_results(detection_results, mesh_results)))
+        except Exception as e:
+            conn.send(('error', str(e)))
+        finally:
+            del rgb_image
+    
+    if attached_memory is not None:
+        attached_memory.close()
+
+def start_inference_process():
+    """Spawn an inference process connected through a pipe"""
+    context = multiprocessing.get_context('spawn')
+    parent_conn, child_conn = context.Pipe()
+    process = context.Process(target=inference_process_main, args=(child_conn,), daemon=True)
+    process.start()
+    child_conn.close()
+    
+    # Tunggu model selesai dimuat agar tidak terhitung sebagai waktu inferensi
+    if parent_conn.poll(INFERENCE_PROCESS_TIMEOUT):
+        status, message = parent_conn.recv()
+        if status != 'ready':
+            logger.error(f"Inference process failed to start: {message}")
+    else:
+        logger.error("Inference process did not become ready in time")
+    
+    worker = {'process': process, 'conn': parent_conn, 'memory': None}
+    inference_processes.append(worker)
+    logger.info(f"Inference process started (pid {process.pid})")
+    return worker
+
+def stop_inference_process(worker):
+    """Stop an inference process and release its shared memory"""
+    try:
+        worker['conn'].send(None)
+    except Exception:
+        pass
+    worker['process'].join(timeout=2)
+    if worker['process'].is_alive():
+        worker['process'].kill()
+    
+    if worker['memory'] is not None:
+        worker['memory'].close()
+        worker['memory'].unlink()
+        worker['memory'] = None
+    
+    if worker in inference_processes:
+        inference_processes.remove(worker)
+
+@atexit.register
+def stop_all_inference_processes():
+    """Stop inference processes on interpreter exit"""
+    for worker in list(inference_processes):
+        stop_inference_process(worker)
+
+def run_in_inference_process(worker, image, refine_landmarks):
+    """Hand a frame to an inference process through shared memory and wait for the faces"""
+    if not worker['process'].is_alive():
+        logger.warning("Inference process died, restarting")
+        stop_inference_process(worker)
+        worker = inference_local.worker = start_inference_process()
+    
+    memory = worker['memory']
+    if memory is None or memory.size < image.nbytes:
+        if memory is not None:
+            memory.close()
+            memory.unlink()
+        memory = shared_memory.SharedMemory(create=True, size=image.nbytes)
+        worker['memory'] = memory
+    
+    # Konversi warna langsung ke buffer shared memory
+    rgb_image = np.ndarray(image.shape, dtype=np.uint8, buffer=memory.buf)
+    cv.cvtColor(image, cv.COLOR_BGR2RGB, dst=rgb_image)
+    del rgb_image
+    
+    worker['conn'].send((memory.name, image.shape, refine_landmarks))
+    if not worker['conn'].poll(INFERENCE_PROCESS_TIMEOUT):
+        stop_inference_process(worker)
+        inference_local.worker = start_inference_process()
+        raise RuntimeError("Inference process timed out")
+    
+    status, result = worker['conn'].recv()
+    if status != 'ok':
+        raise RuntimeError(result)
+    return result
+
+def get_scheduler_status():
+    """Queue depths and live latency counters of the inference scheduler"""
+    with inference_condition:
+        return {
+            "live_queued": len(inference_scheduler['live_queue']),
+            "upload_jobs": len(inference_scheduler['upload_queues']),
+            "upload_queued": sum(len(job_queue) for job_queue in inference_scheduler['upload_queues'].values()),
+            "live_completed": inference_scheduler['live_completed'],
+            "upload_completed": inference_scheduler['upload_completed'],
+            "live_slo_ms": LIVE_FRAME_SLO_MS,
+            "live_slo_misses": inference_scheduler['live_slo_misses'],
+            "avg_live_wait_ms": round(inference_scheduler['avg_live_wait_ms'], 1),
+            "inference_processes": INFERENCE_PROCESSES
+        }
 
 def draw_landmarks(image, landmarks, land_mark, color):
     """Draw landmarks on the image."""
     height, width = image.shape[:2]
     for face in land_mark:
-        point = landmarks.landmark[face]
-        point_scale = (int(point.x * width), int(point.y * height))     
+        point = landmarks[face]
+        point_scale = (int(point[0] * width), int(point[1] * height))     
         cv.circle(image, point_scale, 1, color, 1)
 
 def calculate_ear(eye_points):
@@ -171,7 +2001,7 @@ def check_iris_in_middle(left_eye_points, left_iris_points, right_eye_points, ri
         abs(right_iris_mid[0] - right_eye_mid[0]) <= threshold
     )
 
-def model_detect(frame, landmarks):
+def model_detect(frame, landmarks, draw_details=True):
     """Detect user attention state based on EAR, MAR, and iris location."""
     COLOR_RED = (0, 0, 255)
     COLOR_BLUE = (255, 0, 0)
@@ -193,21 +2023,25 @@ def model_detect(frame, landmarks):
 
     try:
         # Desain facial landmarks
-        draw_landmarks(frame, landmarks, FACE, COLOR_GREEN)
-        draw_landmarks(frame, landmarks, LEFT_EYE, COLOR_RED)
-        draw_landmarks(frame, landmarks, RIGHT_EYE, COLOR_RED)
-        draw_landmarks(frame, landmarks, UPPER_LOWER_LIPS, COLOR_BLUE)
-        draw_landmarks(frame, landmarks, LEFT_RIGHT_LIPS, COLOR_BLUE)
+        if draw_details:
+            draw_landmarks(frame, landmarks, FACE, COLOR_GREEN)
+            draw_landmarks(frame, landmarks, LEFT_EYE, COLOR_RED)
+            draw_landmarks(frame, landmarks, RIGHT_EYE, COLOR_RED)
+            draw_landmarks(frame, landmarks, UPPER_LOWER_LIPS, COLOR_BLUE)
+            draw_landmarks(frame, landmarks, LEFT_RIGHT_LIPS, COLOR_BLUE)
 
         img_h, img_w = frame.shape[:2]
-        mesh_points = [(int(p.x * img_w), int(p.y * img_h)) for p in landmarks.landmark]
-        mesh_points = np.array(mesh_points)
+        mesh_points = (landmarks * (img_w, img_h)).astype(int)
 
         # Extract landmarks
         left_eye_pts = mesh_points[LEFT_EYE]
         right_eye_pts = mesh_points[RIGHT_EYE]
-        left_iris_pts = mesh_points[LEFT_IRIS]
-        right_iris_pts = mesh_points[RIGHT_IRIS]
+        
+        # Landmark iris hanya tersedia dengan refine_landmarks
+        has_iris = len(mesh_points) > max(LEFT_IRIS + RIGHT_IRIS)
+        if has_iris:
+            left_iris_pts = mesh_points[LEFT_IRIS]
+            right_iris_pts = mesh_points[RIGHT_IRIS]
 
         # EAR
         left_ear = calculate_ear(left_eye_pts)
@@ -220,16 +2054,20 @@ def model_detect(frame, landmarks):
         mar = A / B if B != 0 else 0.0
 
         # Iris
-        focused = check_iris_in_middle(left_eye_pts, left_iris_pts, right_eye_pts, right_iris_pts)
+        if has_iris:
+            focused = check_iris_in_middle(left_eye_pts, left_iris_pts, right_eye_pts, right_iris_pts)
+        else:
+            focused = True
 
         # Visualisasi lingkaran iris
-        try:
-            (lx, ly), lr = cv.minEnclosingCircle(left_iris_pts)
-            (rx, ry), rr = cv.minEnclosingCircle(right_iris_pts)
-            cv.circle(frame, (int(lx), int(ly)), int(lr), COLOR_MAGENTA, 1)
-            cv.circle(frame, (int(rx), int(ry)), int(rr), COLOR_MAGENTA, 1)
-        except:
-            pass
+        if has_iris and draw_details:
+            try:
+                (lx, ly), lr = cv.minEnclosingCircle(left_iris_pts)
+                (rx, ry), rr = cv.minEnclosingCircle(right_iris_pts)
+                cv.circle(frame, (int(lx), int(ly)), int(lr), COLOR_MAGENTA, 1)
+                cv.circle(frame, (int(rx), int(ry)), int(rr), COLOR_MAGENTA, 1)
+            except:
+                pass
 
         # Logika Kondisi
         eyes_closed = avg_ear < 0.15
@@ -272,6 +2110,7 @@ def handle_no_person_detection(current_time, mode="video"):
     if not no_person_state['active']:
         no_person_state['active'] = True
         no_person_state['start_time'] = current_time
+        store_state_change('NO PERSON', current_time)
         logger.info("Started NO PERSON tracking")
         return 0
     
@@ -345,6 +2184,7 @@ def update_person_state(current_state, current_time):
         # Update status
         current_person_state = current_state
         person_state_start_time = current_time
+        store_state_change(current_state, current_time)
         
         # Hapus pengingat waktu untuk status baru
         if current_state in last_alert_times:
@@ -426,6 +2266,8 @@ def trigger_alert(person_label, alert_type, duration, is_reminder=False):
                 'is_reminder': is_reminder
             }
             session_data['alerts'].append(alert_entry)
+            increment_counter('alerts', alert_type)
+            persist_session_event('alert', session_data['session_id'], {'t': current_time, 'alert': alert_entry})
             logger.info(f"Alert stored - {display_message} (Duration: {duration:.1f}s)")
 
 def calculate_distraction_times():
@@ -480,35 +2322,59 @@ def calculate_distraction_times():
     
     return totals
 
-def detect_persons_with_attention(image, mode="image"):
+def detect_persons_with_attention(image, mode="image", quality=None):
     """Person detection with mode support for single vs multiple detection"""
-    global live_monitoring_active, session_data, face_detection, face_mesh
-    global current_person_state, person_state_start_time, no_person_state
+    settings = quality or get_quality_settings()
+    
+    faces, meshes = infer_faces(image, settings)
+    if faces is None:
+        return image, []
+    
+    return annotate_detections(image, faces, meshes, mode, settings)
+
+def infer_faces(image, settings):
+    """Face detection and face mesh for an image; (None, None) when MediaPipe fails"""
+    global face_detection, face_mesh
     
-    if face_detection is None or face_mesh is None:
+    in_process = getattr(inference_local, 'worker', None) is None
+    if in_process and (face_detection is None or face_mesh is None):
         if not init_mediapipe():
             logger.error("MediaPipe not available")
-            return image, []
-
-    rgb_image = cv.cvtColor(image, cv.COLOR_BGR2RGB)
+            return None, None
     
+    # Inferensi pada resolusi lebih kecil, koordinat MediaPipe tetap relatif
+    inference_image = image
+    if settings['inference_scale'] < 1.0:
+        stage_start = time.perf_counter()
+        inference_image = cv.resize(image, None, fx=settings['inference_scale'], fy=settings['inference_scale'],
+                                    interpolation=cv.INTER_AREA)
+        record_stage('resize', stage_start)
+    
+    inference_start = time.time()
     try:
-        detection_results = face_detection.process(rgb_image)
-        mesh_results = face_mesh.process(rgb_image)
+        faces, meshes = run_face_models(inference_image, settings['refine_landmarks'])
     except Exception as e:
         logger.error(f"MediaPipe processing error: {str(e)}")
-        return image, []
+        return None, None
+    record_inference_time((time.time() - inference_start) * 1000)
+    
+    return faces, meshes
+
+def annotate_detections(image, faces, meshes, mode, settings):
+    """Attention state, session tracking and overlays for the faces found by infer_faces"""
+    global live_monitoring_active, session_data
+    global current_person_state, person_state_start_time, no_person_state
     
     detections = []
     ih, iw, _ = image.shape
     current_time = time.time()
     
-    with monitoring_lock:
+    with timed_lock(monitoring_lock):
         is_monitoring_active = live_monitoring_active
         current_session_data = session_data.copy() if session_data else None
     
     # Penanganan deteksi NO PERSON untuk mode video live
-    if not detection_results.detections:
+    if not faces:
         if mode == "video" and is_monitoring_active:
             no_person_duration = handle_no_person_detection(current_time, mode)
             
@@ -533,18 +2399,17 @@ def detect_persons_with_attention(image, mode="image"):
     # Tampilkan jumlah deteksi
     if mode == "video":
         # Live monitoring: hanya proses satu wajah pertama
-        faces_to_process = detection_results.detections[:1]
+        faces_to_process = faces[:1]
         max_faces = 1
     else:
         # Upload mode: proses semua wajah yang terdeteksi
-        faces_to_process = detection_results.detections
-        max_faces = len(detection_results.detections)
+        faces_to_process = faces
+        max_faces = len(faces)
     
     # Proses setiap wajah terdeteksi
-    for face_idx, detection in enumerate(faces_to_process):
-        bboxC = detection.location_data.relative_bounding_box
-        x, y, w, h = int(bboxC.xmin * iw), int(bboxC.ymin * ih), \
-                     int(bboxC.width * iw), int(bboxC.height * ih)
+    for face_idx, (xmin, ymin, width, height, confidence_score) in enumerate(faces_to_process):
+        x, y, w, h = int(xmin * iw), int(ymin * ih), \
+                     int(width * iw), int(height * ih)
         
         # bounding box
         x = max(0, x)
@@ -552,8 +2417,6 @@ def detect_persons_with_attention(image, mode="image"):
         w = min(w, iw - x)
         h = min(h, ih - y)
         
-        confidence_score = detection.score[0]
-        
         # Status Perhatian
         attention_status = {
             "eyes_closed": False,
@@ -564,17 +2427,10 @@ def detect_persons_with_attention(image, mode="image"):
         
         # Hubungkan face mesh dengan deteksi
         matched_face_idx = -1
-        if mesh_results.multi_face_landmarks and face_idx < len(mesh_results.multi_face_landmarks):
-            face_landmarks = mesh_results.multi_face_landmarks[face_idx]
-            min_x, min_y = float('inf'), float('inf')
-            max_x, max_y = 0, 0
-            
-            for landmark in face_landmarks.landmark:
-                landmark_x, landmark_y = int(landmark.x * iw), int(landmark.y * ih)
-                min_x = min(min_x, landmark_x)
-                min_y = min(min_y, landmark_y)
-                max_x = max(max_x, landmark_x)
-                max_y = max(max_y, landmark_y)
+        if face_idx < len(meshes):
+            landmark_points = (meshes[face_idx] * (iw, ih)).astype(int)
+            min_x, min_y = landmark_points.min(axis=0)
+            max_x, max_y = np.maximum(landmark_points.max(axis=0), 0)
             
             mesh_center_x = (min_x + max_x) // 2
             mesh_center_y = (min_y + max_y) // 2
@@ -587,8 +2443,11 @@ def detect_persons_with_attention(image, mode="image"):
                 matched_face_idx = face_idx
         
         # Tampilkan detail deteksi
-        if matched_face_idx != -1 and matched_face_idx < len(mesh_results.multi_face_landmarks):
-            attention_status, state = model_detect(image, mesh_results.multi_face_landmarks[matched_face_idx])
+        if matched_face_idx != -1 and matched_face_idx < len(meshes):
+            stage_start = time.perf_counter()
+            attention_status, state = model_detect(image, meshes[matched_face_idx],
+                                                   draw_details=settings['draw_overlay'])
+            record_stage('model_detect', stage_start)
         
         status_text = attention_status.get("state", "FOCUSED")
         
@@ -604,6 +2463,7 @@ def detect_persons_with_attention(image, mode="image"):
                 trigger_alert("You", status_text, session_duration, is_reminder)
         
         # Visualisasi distraksi
+        overlay_start = time.perf_counter()
         if mode == "video" and is_monitoring_active:
             status_colors = {
                 "FOCUSED": (0, 255, 0),
@@ -635,9 +2495,10 @@ def detect_persons_with_attention(image, mode="image"):
             if text_y < text_height + 10:
                 text_y = y + h + text_height + 10
             
-            overlay = image.copy()
-            cv.rectangle(overlay, (x, text_y - text_height - 5), (x + text_width + 10, text_y + 5), (0, 0, 0), -1)
-            cv.addWeighted(overlay, 0.7, image, 0.3, 0, image)
+            if settings['draw_overlay']:
+                overlay = image.copy()
+                cv.rectangle(overlay, (x, text_y - text_height - 5), (x + text_width + 10, text_y + 5), (0, 0, 0), -1)
+                cv.addWeighted(overlay, 0.7, image, 0.3, 0, image)
             
             cv.putText(image, timer_text, (x + 5, text_y), font, font_scale, main_color, thickness)
         else:
@@ -658,12 +2519,13 @@ def detect_persons_with_attention(image, mode="image"):
             if info_y_start + box_height > ih:
                 info_y_start = y - box_height - 10
             
-            overlay = image.copy()
-            cv.rectangle(overlay, 
-                        (x - box_padding, info_y_start - box_padding), 
-                        (x + w + box_padding, info_y_start + box_height), 
-                        (0, 0, 0), -1)
-            cv.addWeighted(overlay, 0.6, image, 0.4, 0, image)
+            if settings['draw_overlay']:
+                overlay = image.copy()
+                cv.rectangle(overlay, 
+                            (x - box_padding, info_y_start - box_padding), 
+                            (x + w + box_padding, info_y_start + box_height), 
+                            (0, 0, 0), -1)
+                cv.addWeighted(overlay, 0.6, image, 0.4, 0, image)
             
             font = cv.FONT_HERSHEY_SIMPLEX
             font_scale = 0.5
@@ -685,26 +2547,34 @@ def detect_persons_with_attention(image, mode="image"):
             
             cv.putText(image, f"Status: {status_text}", 
                     (x, info_y_start + 2*line_height), font, font_scale, color, thickness)
+        record_stage('overlay', overlay_start)
 
         # Simpan wajah yang terdeteksi
-        face_img = image[y:y+h, x:x+w]
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        face_filename = f"person_{face_idx + 1}_{timestamp}_{uuid.uuid4().hex[:8]}.jpg"
-        face_path = os.path.join(application.config['DETECTED_FOLDER'], face_filename)
-        
-        if face_img.size > 0:
-            try:
-                cv.imwrite(face_path, face_img)
-            except Exception as e:
-                logger.error(f"Error saving face image: {str(e)}")
+        image_path = None
+        if settings['save_crops']:
+            stage_start = time.perf_counter()
+            face_img = image[y:y+h, x:x+w]
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            face_filename = f"person_{face_idx + 1}_{timestamp}_{uuid.uuid4().hex[:8]}.jpg"
+            face_path = os.path.join(application.config['DETECTED_FOLDER'], face_filename)
+            
+            if face_img.size > 0:
+                try:
+                    cv.imwrite(face_path, face_img)
+                    image_path = f"/static/detected/{face_filename}"
+                except Exception as e:
+                    logger.error(f"Error saving face image: {str(e)}")
+            record_stage('crop_write', stage_start)
         
         # Buat Hasil Deteksi
         detections.append({
             "id": face_idx + 1, 
             "confidence": float(confidence_score),
             "bbox": [x, y, w, h],
-            "image_path": f"/static/detected/{face_filename}",
+            "image_path": image_path,
             "status": status_text,
+            "ear": attention_status.get("EAR"),
+            "mar": attention_status.get("MAR"),
             "timestamp": datetime.now().isoformat(),
             "duration": session_duration if mode == "video" and face_idx == 0 else 0
         })
@@ -723,6 +2593,185 @@ def detect_persons_with_attention(image, mode="image"):
     
     return image, detections
 
+def reset_frame_change_state():
+    """Reset change detection state for a new session"""
+    global frame_change_state
+    
+    frame_change_state = {
+        'reference_gray': None,
+        'last_processed_frame': None,
+        'last_detections': [],
+        'consecutive_reuse': 0,
+        'frames_reused': 0
+    }
+
+def compute_change_signature(frame):
+    """Downsampled grayscale signature used for frame differencing"""
+    gray = cv.cvtColor(frame, cv.COLOR_BGR2GRAY)
+    return cv.resize(gray, CHANGE_DETECTION_SIZE, interpolation=cv.INTER_AREA)
+
+def frame_has_changed(signature):
+    """Compare signature against the last analysed frame using mean absolute difference"""
+    reference = frame_change_state['reference_gray']
+    
+    if reference is None or frame_change_state['last_processed_frame'] is None:
+        return True
+    
+    # Deteksi penuh berkala agar hasil tidak basi
+    if frame_change_state['consecutive_reuse'] >= CHANGE_DETECTION_MAX_REUSE:
+        return True
+    
+    mad = cv.mean(cv.absdiff(signature, reference))[0]
+    return mad >= CHANGE_DETECTION_THRESHOLD
+
+def reuse_last_detections(current_time):
+    """Advance state timers with the last analysed result for an unchanged frame"""
+    last_detections = frame_change_state['last_detections']
+    processed_frame = frame_change_state['last_processed_frame']
+    
+    frame_change_state['consecutive_reuse'] += 1
+    frame_change_state['frames_reused'] += 1
+    
+    if not last_detections:
+        handle_no_person_detection(current_time, "video")
+        return processed_frame, []
+    
+    # Live monitoring hanya melacak wajah pertama
+    status_text = last_detections[0].get('status', 'FOCUSED')
+    session_duration = update_person_state(status_text, current_time)
+    
+    should_trigger, is_reminder = should_trigger_alert(status_text, session_duration)
+    if should_trigger:
+        logger.info(f"Triggering alert - {status_text} - Duration: {session_duration:.1f}s")
+        trigger_alert("You", status_text, session_duration, is_reminder)
+    
+    detections = []
+    for face_idx, detection in enumerate(last_detections):
+        reused_detection = dict(detection)
+        reused_detection['timestamp'] = datetime.now().isoformat()
+        reused_detection['duration'] = session_duration if face_idx == 0 else 0
+        detections.append(reused_detection)
+    
+    return processed_frame, detections
+
+def analyse_live_frame(frame):
+    """Change check and face inference for a live frame, run outside the live session lock
+    
+    Returns the change signature and the inference result, or None for the
+    inference when the frame is unchanged and the last result can be reused.
+    """
+    signature = compute_change_signature(frame)
+    
+    with timed_lock(monitoring_lock):
+        if live_monitoring_active and not frame_has_changed(signature):
+            return signature, None
+    
+    settings = get_quality_settings()
+    faces, meshes = run_inference(infer_faces, frame, settings, priority="live")
+    return signature, (faces, meshes, settings)
+
+def detect_live_frame(frame, analysis):
+    """Session tracking and overlays for an analysed live frame (caller holds the live session)"""
+    current_time = time.time()
+    signature, inference = analysis
+    
+    with timed_lock(monitoring_lock):
+        if inference is None and live_monitoring_active and frame_change_state['last_processed_frame'] is not None:
+            processed_frame, detections = reuse_last_detections(current_time)
+            return processed_frame, detections, True
+    
+    if inference is None:
+        # Sesi diganti worker lain sejak pengecekan perubahan, hasil lama tidak berlaku
+        settings = get_quality_settings()
+        inference = run_inference(infer_faces, frame, settings, priority="live") + (settings,)
+    
+    faces, meshes, settings = inference
+    if faces is None:
+        processed_frame, detections = frame, []
+    else:
+        processed_frame, detections = annotate_detections(frame, faces, meshes, "video", settings)
+    
+    with timed_lock(monitoring_lock):
+        frame_change_state['reference_gray'] = signature
+        frame_change_state['last_processed_frame'] = processed_frame
+        frame_change_state['last_detections'] = detections
+        frame_change_state['consecutive_reuse'] = 0
+    
+    return processed_frame, detections, False
+
+def reset_frame_admission():
+    """Reset admission control counters for a new session"""
+    with admission_condition:
+        frame_admission['pending_ticket'] = None
+        frame_admission['frames_dropped'] = 0
+        frame_admission['avg_processing_ms'] = 0.0
+        admission_condition.notify_all()
+
+def admit_frame():
+    """Admit a frame for processing; returns a ticket, or None when the frame was superseded"""
+    with admission_condition:
+        frame_admission['next_ticket'] += 1
+        ticket = frame_admission['next_ticket']
+        
+        if not frame_admission['in_flight']:
+            frame_admission['in_flight'] = True
+            return ticket
+        
+        # Hanya satu frame pending, frame lama digantikan frame terbaru
+        frame_admission['pending_ticket'] = ticket
+        admission_condition.notify_all()
+        
+        deadline = time.time() + FRAME_QUEUE_MAX_WAIT
+        while frame_admission['in_flight'] and frame_admission['pending_ticket'] == ticket:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            admission_condition.wait(remaining)
+        
+        if frame_admission['pending_ticket'] != ticket or frame_admission['in_flight']:
+            if frame_admission['pending_ticket'] == ticket:
+                frame_admission['pending_ticket'] = None
+            frame_admission['frames_dropped'] += 1
+            return None
+        
+        frame_admission['pending_ticket'] = None
+        frame_admission['in_flight'] = True
+        return ticket
+
+def release_frame(processing_ms=None):
+    """Release the in-flight slot and record processing time"""
+    with admission_condition:
+        frame_admission['in_flight'] = False
+        
+        if processing_ms is not None:
+            if frame_admission['avg_processing_ms'] > 0:
+                frame_admission['avg_processing_ms'] += PROCESSING_TIME_SMOOTHING * (
+                    processing_ms - frame_admission['avg_processing_ms'])
+            else:
+                frame_admission['avg_processing_ms'] = processing_ms
+        
+        admission_condition.notify_all()
+
+def get_backpressure_hints():
+    """Suggested client capture interval based on processing time and queue depth"""
+    with admission_condition:
+        avg_processing_ms = frame_admission['avg_processing_ms']
+        queue_depth = int(frame_admission['in_flight']) + int(frame_admission['pending_ticket'] is not None)
+        frames_dropped = frame_admission['frames_dropped']
+    
+    min_interval, max_interval = PROCESSING_INTERVAL_BOUNDS_MS
+    suggested_interval = avg_processing_ms * 2
+    if queue_depth > 1:
+        suggested_interval *= 1.5
+    suggested_interval = int(min(max_interval, max(min_interval, suggested_interval)))
+    
+    return {
+        "suggested_interval_ms": suggested_interval,
+        "avg_processing_ms": round(avg_processing_ms, 1),
+        "queue_depth": queue_depth,
+        "frames_dropped": frames_dropped
+    }
+
 def update_session_statistics(detections):
     """Update session statistics"""
     global session_data
@@ -733,6 +2782,8 @@ def update_session_statistics(detections):
     with monitoring_lock:
         if session_data and session_data.get('start_time'):
             session_data['detections'].extend(detections)
+            # Dengan backend bersama daftar deteksi hanya berisi yang terbaru, jumlah sesi dihitung terpisah
+            session_data['detections_count'] = session_data.get('detections_count', 0) + len(detections)
             session_data['focus_statistics']['total_detections'] += len(detections)
             session_data['focus_statistics']['total_persons'] = 1 if detections else 0
             
@@ -1039,86 +3090,532 @@ def generate_live_pdf_report(session_data, output_path):
         )
         story.append(Paragraph(footer_text, footer_style))
         
-        doc.build(story)
-        logger.info(f"PDF report generated: {output_path}")
-        return output_path
-    except Exception as e:
-        logger.error(f"PDF generation error: {str(e)}")
-        traceback.print_exc()
-        return None
+        doc.build(story)
+        logger.info(f"PDF report generated: {output_path}")
+        return output_path
+    except Exception as e:
+        logger.error(f"PDF generation error: {str(e)}")
+        traceback.print_exc()
+        return None
+
+def create_detection_summary(max_rows=REPORT_MAX_DETECTION_ROWS):
+    """Running aggregate of upload detections for the analysis report"""
+    return {
+        'total_detections': 0,
+        'person_counts': {},
+        'status_counts': {'FOCUSED': 0, 'NOT FOCUSED': 0, 'YAWNING': 0, 'SLEEPING': 0},
+        'rows': [],
+        'max_rows': max_rows,
+        'encoding': None
+    }
+
+def add_detections_to_summary(summary, detections):
+    """Consume detections once, keeping counts and the first rows of the report table"""
+    for detection in detections:
+        person_id = detection.get('id', 1)
+        status = detection.get('status', 'FOCUSED')
+        
+        summary['total_detections'] += 1
+        summary['person_counts'][person_id] = summary['person_counts'].get(person_id, 0) + 1
+        summary['status_counts'][status] = summary['status_counts'].get(status, 0) + 1
+        
+        # Hanya baris yang ditampilkan di laporan yang diformat
+        if len(summary['rows']) < summary['max_rows']:
+            bbox = detection.get('bbox', [0, 0, 0, 0])
+            summary['rows'].append([
+                f"Person {person_id}",
+                detection.get('status', 'Unknown'),
+                f"{detection.get('confidence', 0)*100:.1f}%",
+                f"({bbox[0]}, {bbox[1]})",
+                f"({bbox[2]}, {bbox[3]})"
+            ])
+    
+    return summary
+
+def calculate_iou(box_a, box_b):
+    """Intersection over union of two [x, y, w, h] boxes"""
+    ax, ay, aw, ah = box_a
+    bx, by, bw, bh = box_b
+    
+    inter_w = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    inter_h = max(0, min(ay + ah, by + bh) - max(ay, by))
+    intersection = inter_w * inter_h
+    union = aw * ah + bw * bh - intersection
+    
+    return intersection / union if union > 0 else 0.0
+
+def centroids_close(box_a, box_b):
+    """Check whether two boxes have nearby centroids relative to their size"""
+    ax, ay, aw, ah = box_a
+    bx, by, bw, bh = box_b
+    
+    distance = dis.euclidean((ax + aw / 2, ay + ah / 2), (bx + bw / 2, by + bh / 2))
+    return distance <= TRACK_CENTROID_RATIO * max(aw, ah, bw, bh)
+
+def create_person_tracker():
+    """IoU/centroid tracker state for sampled video frames"""
+    return {
+        'next_track_id': 1,
+        'active': {},
+        'finished': []
+    }
+
+def start_track_interval(track, detection, frame_time):
+    """Open a new state interval on a track"""
+    track['intervals'].append({
+        'state': detection.get('status', 'FOCUSED'),
+        'start': frame_time,
+        'end': frame_time,
+        'frames': 0,
+        'ear_sum': 0.0,
+        'ear_count': 0,
+        'mar_sum': 0.0,
+        'mar_count': 0
+    })
+
+def add_detection_to_track(track, detection, frame_time):
+    """Extend the track's current interval, or open a new one when the state changes"""
+    state = detection.get('status', 'FOCUSED')
+    if not track['intervals'] or track['intervals'][-1]['state'] != state:
+        start_track_interval(track, detection, frame_time)
+    
+    interval = track['intervals'][-1]
+    interval['end'] = frame_time
+    interval['frames'] += 1
+    if detection.get('ear') is not None:
+        interval['ear_sum'] += detection['ear']
+        interval['ear_count'] += 1
+    if detection.get('mar') is not None:
+        interval['mar_sum'] += detection['mar']
+        interval['mar_count'] += 1
+    
+    track['bbox'] = detection.get('bbox', track['bbox'])
+    track['last_seen'] = frame_time
+    track['detections'] += 1
+    track['state_counts'][state] = track['state_counts'].get(state, 0) + 1
+    detection['track_id'] = track['track_id']
+
+def update_person_tracks(tracker, detections, frame_time):
+    """Assign stable track ids to one sampled frame's detections"""
+    active = tracker['active']
+    
+    # Pencocokan greedy berdasarkan IoU terbesar
+    candidates = []
+    for det_idx, detection in enumerate(detections):
+        for track_id, track in active.items():
+            iou = calculate_iou(detection['bbox'], track['bbox'])
+            if iou >= TRACK_IOU_THRESHOLD or centroids_close(detection['bbox'], track['bbox']):
+                candidates.append((iou, det_idx, track_id))
+    candidates.sort(reverse=True)
+    
+    matched_detections = set()
+    matched_tracks = set()
+    for iou, det_idx, track_id in candidates:
+        if det_idx in matched_detections or track_id in matched_tracks:
+            continue
+        add_detection_to_track(active[track_id], detections[det_idx], frame_time)
+        matched_detections.add(det_idx)
+        matched_tracks.add(track_id)
+    
+    # Track baru untuk deteksi yang tidak cocok
+    for det_idx, detection in enumerate(detections):
+        if det_idx in matched_detections:
+            continue
+        track = {
+            'track_id': tracker['next_track_id'],
+            'bbox': detection['bbox'],
+            'first_seen': frame_time,
+            'last_seen': frame_time,
+            'detections': 0,
+            'state_counts': {},
+            'intervals': []
+        }
+        tracker['next_track_id'] += 1
+        active[track['track_id']] = track
+        add_detection_to_track(track, detection, frame_time)
+    
+    # Tutup track yang sudah lama tidak terlihat
+    for track_id in [track_id for track_id, track in active.items()
+                     if frame_time - track['last_seen'] > TRACK_MAX_GAP_SECONDS]:
+        tracker['finished'].append(active.pop(track_id))
+
+def finalize_person_tracks(tracker):
+    """Collapse tracks into per-person state intervals"""
+    tracks = tracker['finished'] + list(tracker['active'].values())
+    tracker['finished'] = tracks
+    tracker['active'] = {}
+    
+    results = []
+    for track in sorted(tracks, key=lambda track: track['track_id']):
+        intervals = []
+        for interval in track['intervals']:
+            intervals.append({
+                'state': interval['state'],
+                'start': round(interval['start'], 2),
+                'end': round(interval['end'], 2),
+                'frames': interval['frames'],
+                'mean_ear': round(interval['ear_sum'] / interval['ear_count'], 3) if interval['ear_count'] else None,
+                'mean_mar': round(interval['mar_sum'] / interval['mar_count'], 3) if interval['mar_count'] else None
+            })
+        
+        focused = track['state_counts'].get('FOCUSED', 0)
+        results.append({
+            'track_id': track['track_id'],
+            'first_seen': round(track['first_seen'], 2),
+            'last_seen': round(track['last_seen'], 2),
+            'detections': track['detections'],
+            'state_counts': track['state_counts'],
+            'focus_ratio': round(focused / track['detections'], 3) if track['detections'] else 0,
+            'intervals': intervals
+        })
+    
+    return results
+
+def create_processed_video_path():
+    """Unique output path for an annotated video"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_filename = f"processed_{timestamp}_{uuid.uuid4().hex[:8]}.mp4"
+    return os.path.join(application.config['DETECTED_FOLDER'], output_filename)
+
+def put_until_stopped(target_queue, item, stop_event):
+    """Put into a bounded queue, giving up once the pipeline is stopped"""
+    while True:
+        try:
+            target_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            if stop_event.is_set():
+                return False
+
+def decode_video_frames(cap, frame_queue, stop_event, timings=None):
+    """Decoder stage, reads frames into a bounded queue"""
+    stage_timing_local.timings = timings
+    try:
+        while not stop_event.is_set():
+            stage_start = time.perf_counter()
+            ret, frame = cap.read()
+            record_stage('decode', stage_start)
+            if not ret:
+                break
+            if not put_until_stopped(frame_queue, frame, stop_event):
+                return
+    except Exception as e:
+        logger.error(f"Video decode error: {str(e)}")
+    finally:
+        put_until_stopped(frame_queue, None, stop_event)
+
+def resolve_video_profile(profile_name):
+    """Output profile by name, falling back to the configured default"""
+    if profile_name not in VIDEO_OUTPUT_PROFILES:
+        profile_name = DEFAULT_VIDEO_OUTPUT_PROFILE if DEFAULT_VIDEO_OUTPUT_PROFILE in VIDEO_OUTPUT_PROFILES else 'full'
+    return profile_name, VIDEO_OUTPUT_PROFILES[profile_name]
+
+def open_video_encoder(output_path, fps, size):
+    """H.264 through an ffmpeg pipe when available, otherwise an OpenCV mp4v writer"""
+    width, height = size
+    
+    if FFMPEG_PATH:
+        command = [
+            FFMPEG_PATH, '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f'{width}x{height}', '-r', f'{fps:.3f}', '-i', '-',
+            '-an', '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p',
+            '-vf', 'scale=trunc(iw/2)*2:trunc(ih/2)*2', '-movflags', '+faststart',
+            output_path
+        ]
+        try:
+            process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                       stderr=subprocess.PIPE)
+            return {'codec': 'h264', 'process': process, 'writer': None, 'size': size,
+                    'output_path': output_path, 'fps': fps}
+        except OSError as e:
+            logger.warning(f"ffmpeg unavailable, falling back to OpenCV writer: {str(e)}")
+    
+    fourcc = cv.VideoWriter_fourcc(*'mp4v')
+    writer = cv.VideoWriter(output_path, fourcc, fps, size)
+    return {'codec': 'mp4v', 'process': None, 'writer': writer, 'size': size,
+            'output_path': output_path, 'fps': fps}
+
+def fall_back_to_opencv_writer(encoder):
+    """Replace an ffmpeg pipe that exited early with an OpenCV mp4v writer for the remaining frames"""
+    process = encoder['process']
+    try:
+        process.stdin.close()
+    except OSError:
+        pass
+    error_output = process.stderr.read().decode(errors='replace').strip()
+    process.wait()
+    logger.error(f"ffmpeg exited during encoding ({process.returncode}), falling back to OpenCV writer: {error_output}")
+    
+    fourcc = cv.VideoWriter_fourcc(*'mp4v')
+    encoder['writer'] = cv.VideoWriter(encoder['output_path'], fourcc, encoder['fps'], encoder['size'])
+    encoder['process'] = None
+    encoder['codec'] = 'mp4v'
+
+def write_video_frame(encoder, frame):
+    """Write one frame, resizing it to the encoder's output size"""
+    if (frame.shape[1], frame.shape[0]) != encoder['size']:
+        frame = cv.resize(frame, encoder['size'], interpolation=cv.INTER_AREA)
+    
+    if encoder['process'] is not None:
+        try:
+            encoder['process'].stdin.write(np.ascontiguousarray(frame).tobytes())
+            return
+        except BrokenPipeError:
+            fall_back_to_opencv_writer(encoder)
+    
+    encoder['writer'].write(frame)
+
+def close_video_encoder(encoder):
+    """Finish the output file"""
+    if encoder['process'] is not None:
+        process = encoder['process']
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        error_output = process.stderr.read().decode(errors='replace').strip()
+        process.wait()
+        if process.returncode != 0:
+            logger.error(f"ffmpeg encoding failed ({process.returncode}): {error_output}")
+    else:
+        encoder['writer'].release()
+
+def encode_video_frames(encoder, write_queue, encoding_stats, timings=None):
+    """Encoder stage, writes annotated frames in their original order"""
+    stage_timing_local.timings = timings
+    while True:
+        frame = write_queue.get()
+        if frame is None:
+            break
+        
+        encode_start = time.perf_counter()
+        try:
+            write_video_frame(encoder, frame)
+            encoding_stats['frames_written'] += 1
+            encoding_stats['codec'] = encoder['codec']
+        except Exception as e:
+            logger.error(f"Video encode error: {str(e)}")
+        encoding_stats['encode_seconds'] += time.perf_counter() - encode_start
+        record_stage('encode', encode_start)
 
-def process_video_file(video_path):
-    """Process video file and collect all detections"""
+def iter_video_analysis(video_path, output_path, summary, tracker, profile=None):
+    """Analyse a video while writing the annotated copy, yielding every analysed frame"""
     cap = cv.VideoCapture(video_path)
     fps = cap.get(cv.CAP_PROP_FPS)
     width = int(cap.get(cv.CAP_PROP_FRAME_WIDTH))
     height = int(cap.get(cv.CAP_PROP_FRAME_HEIGHT))
+    total_frames = int(cap.get(cv.CAP_PROP_FRAME_COUNT))
     
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_filename = f"processed_{timestamp}_{uuid.uuid4().hex[:8]}.mp4"
-    output_path = os.path.join(application.config['DETECTED_FOLDER'], output_filename)
+    profile_name, profile_settings = resolve_video_profile(profile)
+    source_fps = fps if fps > 0 else 25
     
-    fourcc = cv.VideoWriter_fourcc(*'mp4v')
-    out = cv.VideoWriter(output_path, fourcc, fps, (width, height))
+    # Resolusi dan fps output sesuai profil
+    output_size = (width, height)
+    if profile_settings['max_width'] and width > profile_settings['max_width']:
+        scale = profile_settings['max_width'] / width
+        output_size = (int(width * scale) // 2 * 2, int(height * scale) // 2 * 2)
+    
+    write_every = 1
+    if profile_settings['max_fps'] and source_fps > profile_settings['max_fps']:
+        write_every = int(np.ceil(source_fps / profile_settings['max_fps']))
+    output_fps = source_fps / write_every
+    if profile_settings['analysed_only']:
+        output_fps = source_fps / get_quality_settings()['video_frame_step']
+    
+    encoding_stats = {
+        'profile': profile_name,
+        'codec': None,
+        'resolution': list(output_size),
+        'fps': round(output_fps, 2),
+        'frames_written': 0,
+        'encode_seconds': 0.0,
+        'output_size_bytes': 0
+    }
+    summary['encoding'] = encoding_stats
+    
+    encoder = None
+    if profile_settings['write_video'] and output_path:
+        encoder = open_video_encoder(output_path, output_fps, output_size)
+        encoding_stats['codec'] = encoder['codec']
     
-    all_detections = []
     frame_count = 0
-    process_every_n_frames = 5  # proses setiap 5 langkah video
+    last_analysed_frame = 0
+    job_id = uuid.uuid4().hex
     
     logger.info("Starting video processing...")
     
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
-        frame_count += 1
-        
-        if frame_count % process_every_n_frames == 0:
-            # Proses frame untuk deteksi distrak
-            processed_frame, detections = detect_persons_with_attention(frame, mode="upload")
+    # Decode dan encode berjalan di thread terpisah, OpenCV melepas GIL
+    frame_queue = queue.Queue(maxsize=VIDEO_PIPELINE_QUEUE_SIZE)
+    write_queue = queue.Queue(maxsize=VIDEO_PIPELINE_QUEUE_SIZE)
+    stop_event = threading.Event()
+    
+    timings = current_stage_timings()
+    decoder = threading.Thread(target=decode_video_frames, args=(cap, frame_queue, stop_event, timings),
+                               name='video-decoder', daemon=True)
+    decoder.start()
+    
+    encoder_thread = None
+    if encoder is not None:
+        encoder_thread = threading.Thread(target=encode_video_frames,
+                                          args=(encoder, write_queue, encoding_stats, timings),
+                                          name='video-encoder', daemon=True)
+        encoder_thread.start()
+    
+    try:
+        while True:
+            frame = frame_queue.get()
+            if frame is None:
+                break
             
-            # Add frame timestamp to each detection
-            for detection in detections:
-                detection['frame_number'] = frame_count
-                detection['frame_time'] = frame_count / fps if fps > 0 else 0
+            frame_count += 1
             
-            # Kumpulkan semua deteksi
-            all_detections.extend(detections)
+            # Jarak antar frame yang dianalisis mengikuti level degradasi
+            analysed = frame_count - last_analysed_frame >= get_quality_settings()['video_frame_step']
+            if analysed:
+                last_analysed_frame = frame_count
+                
+                # Proses frame untuk deteksi distrak
+                processed_frame, detections = run_inference(detect_persons_with_attention, frame, mode="upload",
+                                                            priority="upload", job_id=job_id)
+                
+                # Add frame timestamp to each detection
+                frame_time = frame_count / fps if fps > 0 else 0
+                for detection in detections:
+                    detection['frame_number'] = frame_count
+                    detection['frame_time'] = frame_time
+                
+                update_person_tracks(tracker, detections, frame_time)
+                add_detections_to_summary(summary, detections)
+                
+                if frame_count % 100 == 0:  # Log proses setiap 100 frame
+                    logger.info(f"Processed {frame_count} frames, found {len(detections)} detections in current frame")
+                
+                yield {
+                    'frame_number': frame_count,
+                    'total_frames': total_frames,
+                    'frame_time': frame_time,
+                    'detections': detections
+                }
+            else:
+                processed_frame = frame
             
-            if frame_count % 100 == 0:  # Log proses setiap 100 frame
-                logger.info(f"Processed {frame_count} frames, found {len(detections)} detections in current frame")
-        else:
-            processed_frame = frame
+            if encoder_thread is not None:
+                if profile_settings['analysed_only']:
+                    if analysed:
+                        write_queue.put(processed_frame)
+                elif frame_count % write_every == 0:
+                    write_queue.put(processed_frame)
+    finally:
+        stop_event.set()
+        decoder.join()
+        cap.release()
+        
+        if encoder_thread is not None:
+            write_queue.put(None)
+            encoder_thread.join()
             
-        out.write(processed_frame)
-    
-    cap.release()
-    out.release()
+            close_start = time.perf_counter()
+            close_video_encoder(encoder)
+            record_stage('encode', close_start)
+            encoding_stats['encode_seconds'] = round(encoding_stats['encode_seconds'] + time.perf_counter() - close_start, 3)
+            if os.path.exists(output_path):
+                encoding_stats['output_size_bytes'] = os.path.getsize(output_path)
     
     logger.info(f"Video processing completed: {output_path}")
     logger.info(f"Total frames processed: {frame_count}")
+    logger.info(f"Video output ({profile_name}, {encoding_stats['codec']}): {encoding_stats['frames_written']} frames, "
+                f"{encoding_stats['encode_seconds']:.2f}s encode, {encoding_stats['output_size_bytes']} bytes")
+
+def process_video_file(video_path, summary=None, tracker=None, profile=None):
+    """Process video file and collect all detections"""
+    profile, profile_settings = resolve_video_profile(profile)
+    output_path = create_processed_video_path() if profile_settings['write_video'] else None
+    
+    if summary is None:
+        summary = create_detection_summary()
+    if tracker is None:
+        tracker = create_person_tracker()
+    
+    all_detections = []
+    for analysed_frame in iter_video_analysis(video_path, output_path, summary, tracker, profile):
+        # Kumpulkan semua deteksi
+        all_detections.extend(analysed_frame['detections'])
+    
     logger.info(f"Total detections collected: {len(all_detections)}")
     
     # Log ringkasan deteksi
-    if all_detections:
-        status_summary = {}
-        person_summary = {}
-        
-        for detection in all_detections:
-            status = detection.get('status', 'UNKNOWN')
-            person_id = detection.get('id', 'UNKNOWN')
+    if summary['total_detections']:
+        logger.info(f"Detection status summary: {summary['status_counts']}")
+        logger.info(f"Person detection summary: {summary['person_counts']}")
+        logger.info(f"Person tracks: {tracker['next_track_id'] - 1}")
+    
+    return output_path, all_detections
+
+def stream_video_analysis(video_path, profile=None):
+    """NDJSON records (progress, detection segments, final summary) while a video is analysed"""
+    profile, profile_settings = resolve_video_profile(profile)
+    output_path = create_processed_video_path() if profile_settings['write_video'] else None
+    summary = create_detection_summary()
+    tracker = create_person_tracker()
+    
+    segment = []
+    segment_start = None
+    last_frame = 0
+    analysed_count = 0
+    
+    try:
+        for analysed_frame in iter_video_analysis(video_path, output_path, summary, tracker, profile):
+            analysed_count += 1
+            last_frame = analysed_frame['frame_number']
+            if segment_start is None:
+                segment_start = analysed_frame['frame_number']
+            segment.extend(analysed_frame['detections'])
             
-            status_summary[status] = status_summary.get(status, 0) + 1
-            person_summary[person_id] = person_summary.get(person_id, 0) + 1
+            if analysed_count % STREAM_SEGMENT_FRAMES == 0:
+                total_frames = analysed_frame['total_frames']
+                yield json.dumps({
+                    "type": "progress",
+                    "frame": analysed_frame['frame_number'],
+                    "total_frames": total_frames,
+                    "percent": round(analysed_frame['frame_number'] / total_frames * 100, 1) if total_frames > 0 else None,
+                    "detections_so_far": summary['total_detections']
+                }) + "\n"
+                yield json.dumps({
+                    "type": "detections",
+                    "start_frame": segment_start,
+                    "end_frame": analysed_frame['frame_number'],
+                    "detections": segment
+                }) + "\n"
+                segment = []
+                segment_start = None
+        
+        if segment_start is not None:
+            yield json.dumps({
+                "type": "detections",
+                "start_frame": segment_start,
+                "end_frame": last_frame,
+                "detections": segment
+            }) + "\n"
         
-        logger.info(f"Detection status summary: {status_summary}")
-        logger.info(f"Person detection summary: {person_summary}")
+        yield json.dumps({
+            "type": "summary",
+            "processed_video": f"/static/detected/{os.path.basename(output_path)}" if output_path else None,
+            "total_detections": summary['total_detections'],
+            "status_counts": summary['status_counts'],
+            "tracks": finalize_person_tracks(tracker),
+            "encoding": summary['encoding']
+        }) + "\n"
     
-    return output_path, all_detections
+    except Exception as e:
+        logger.error(f"Video stream error: {str(e)}")
+        traceback.print_exc()
+        yield json.dumps({"type": "error", "error": str(e)}) + "\n"
 
-def generate_upload_pdf_report(detections, file_info, output_path):
+def generate_upload_pdf_report(detections, file_info, output_path, summary=None, tracks=None):
     """Analisis laporan PDF  untuk file upload uploaded """
+    if summary is None:
+        summary = add_detections_to_summary(create_detection_summary(), detections)
+    
     doc = SimpleDocTemplate(output_path, pagesize=A4)
     styles = getSampleStyleSheet()
     story = []
@@ -1148,8 +3645,8 @@ def generate_upload_pdf_report(detections, file_info, output_path):
     story.append(Paragraph("File Information", heading_style))
     
     # Akumulasi Unik Person dan Total Detections
-    unique_persons = len(set(detection.get('id', 1) for detection in detections))
-    total_detections = len(detections)
+    unique_persons = len(tracks) if tracks is not None else len(summary['person_counts'])
+    total_detections = summary['total_detections']
     
     file_info_data = [
         ['File Name', file_info.get('filename', 'Unknown')],
@@ -1177,11 +3674,7 @@ def generate_upload_pdf_report(detections, file_info, output_path):
     # Statistics
     story.append(Paragraph("Analysis Statistics", heading_style))
     
-    status_counts = {'FOCUSED': 0, 'NOT FOCUSED': 0, 'YAWNING': 0, 'SLEEPING': 0}
-    for detection in detections:
-        status = detection.get('status', 'FOCUSED')
-        if status in status_counts:
-            status_counts[status] += 1
+    status_counts = summary['status_counts']
     
     focus_accuracy = 0
     if total_detections > 0:
@@ -1212,32 +3705,50 @@ def generate_upload_pdf_report(detections, file_info, output_path):
     story.append(analysis_table)
     story.append(Spacer(1, 15))
     
+    # Perhatian per person dari hasil tracking video
+    if tracks:
+        story.append(Paragraph("Per-Person Attention", heading_style))
+        
+        track_data = [['Person', 'Visible (s)', 'Detections', 'Focus Ratio', 'Main State', 'State Changes']]
+        for track in tracks[:REPORT_MAX_DETECTION_ROWS]:
+            main_state = max(track['state_counts'], key=track['state_counts'].get) if track['state_counts'] else 'N/A'
+            track_data.append([
+                f"Person {track['track_id']}",
+                f"{track['first_seen']:.1f} - {track['last_seen']:.1f}",
+                str(track['detections']),
+                f"{track['focus_ratio']*100:.1f}%",
+                main_state,
+                str(max(0, len(track['intervals']) - 1))
+            ])
+        
+        track_table = Table(track_data, colWidths=[0.9*inch, 1.2*inch, 0.9*inch, 1*inch, 1.1*inch, 1*inch])
+        track_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3B82F6')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#E5E7EB')),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F9FAFB')])
+        ]))
+        
+        story.append(track_table)
+        story.append(Spacer(1, 15))
+    
     # Menampilkan Semua Deteksi
-    if detections:
+    if total_detections:
         story.append(Paragraph("Detection Results", heading_style))
         
         detection_headers = ['Person ID', 'Status', 'Confidence', 'Position (X,Y)', 'Size (W,H)']
-        detection_data = [detection_headers]
-        
-        for detection in detections:
-            bbox = detection.get('bbox', [0, 0, 0, 0])
-            person_id = detection.get('id', 1)
-            
-            detection_data.append([
-                f"Person {person_id}",
-                detection.get('status', 'Unknown'),
-                f"{detection.get('confidence', 0)*100:.1f}%",
-                f"({bbox[0]}, {bbox[1]})",
-                f"({bbox[2]}, {bbox[3]})"
-            ])
+        detection_data = [detection_headers] + summary['rows']
         
         # Batasi jumlah deteksi yang ditampilkan
-        max_detections_to_show = 50
-        if len(detection_data) > max_detections_to_show + 1:  # +1 for header
-            detection_data = detection_data[:max_detections_to_show + 1]
-            
+        max_detections_to_show = len(summary['rows'])
+        if total_detections > max_detections_to_show:
             # Tambahkan note tentang jumlah deteksi yang ditampilkan
-            story.append(Paragraph(f"<i>Note: Showing first {max_detections_to_show} detections out of {len(detections)} total detections</i>", styles['Normal']))
+            story.append(Paragraph(f"<i>Note: Showing first {max_detections_to_show} detections out of {total_detections} total detections</i>", styles['Normal']))
             story.append(Spacer(1, 10))
         
         detection_table = Table(detection_data, colWidths=[1*inch, 1*inch, 1*inch, 1.5*inch, 1.5*inch])
@@ -1273,7 +3784,314 @@ def generate_upload_pdf_report(detections, file_info, output_path):
     logger.info(f"Upload analysis PDF generated: {output_path}")
     return output_path
 
+def sniff_upload_kind(header):
+    """File kind ('image' / 'video') from its leading bytes, None if unrecognised"""
+    for offset, signature, kind in UPLOAD_SIGNATURES:
+        if header[offset:offset + len(signature)] == signature:
+            return kind
+    return None
+
+class UploadSink:
+    """Write target for a streamed file part: unique name, running SHA-256, size limit and type sniffing
+    
+    A batch sink also accepts zip archives, and records a rejected part in
+    error instead of failing the whole request.
+    """
+    
+    def __init__(self, filename, batch=False):
+        self.original_filename = secure_filename(filename or '') or 'upload'
+        self.filename = f"{uuid.uuid4().hex[:12]}_{self.original_filename}"
+        self.path = os.path.join(application.config['UPLOAD_FOLDER'], self.filename)
+        self.extension = self.original_filename.rsplit('.', 1)[1].lower() if '.' in self.original_filename else ''
+        self.batch = batch
+        self.kind = None
+        self.error = None
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+        self._header = b''
+        self._file = None
+    
+    def _reject(self, error):
+        self.discard()
+        self._header = b''
+        if not self.batch:
+            raise error
+        # Sisa part batch diabaikan, request tetap diproses
+        self.error = error.description
+    
+    def _open(self):
+        # Tolak tipe yang tidak didukung sebelum ada byte yang ditulis ke disk
+        kind = sniff_upload_kind(self._header)
+        extension_kinds = BATCH_EXTENSION_KINDS if self.batch else UPLOAD_EXTENSION_KINDS
+        if kind is None or kind != extension_kinds.get(self.extension):
+            self._reject(UnsupportedMediaType(f"Unsupported file type: {self.original_filename}"))
+            return
+        
+        self.kind = kind
+        self._file = open(self.path, 'w+b')
+        self._file.write(self._header)
+        self._header = b''
+    
+    def write(self, data):
+        if self.error is not None:
+            return len(data)
+        
+        self.size += len(data)
+        if self.size > UPLOAD_MAX_BYTES:
+            self._reject(RequestEntityTooLarge(f"File exceeds the {UPLOAD_MAX_BYTES // (1024 * 1024)} MB upload limit"))
+            return len(data)
+        
+        self.sha256.update(data)
+        
+        if self._file is None:
+            self._header += data
+            if len(self._header) >= UPLOAD_SNIFF_BYTES:
+                self._open()
+        else:
+            self._file.write(data)
+        return len(data)
+    
+    def seek(self, offset, whence=0):
+        if self._file is None and self.error is None:
+            self._open()
+        return self._file.seek(offset, whence) if self._file is not None else 0
+    
+    def tell(self):
+        return self._file.tell() if self._file is not None else len(self._header)
+    
+    def read(self, size=-1):
+        if self._file is None and self.error is None:
+            self._open()
+        return self._file.read(size) if self._file is not None else b''
+    
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+    
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+    
+    def discard(self):
+        """Drop a partially written upload"""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+class UploadRequest(Request):
+    """Request whose multipart file parts stream straight into the upload folder on the upload endpoints"""
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.endpoint not in UPLOAD_ENDPOINTS:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        return UploadSink(filename, batch=self.endpoint in BATCH_UPLOAD_ENDPOINTS)
+
+application.request_class = UploadRequest
+
+def copy_to_upload_sink(filename, stream, batch=False):
+    """Chunked copy of a readable stream through the upload checks"""
+    sink = UploadSink(filename, batch)
+    try:
+        while True:
+            chunk = stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            sink.write(chunk)
+        if sink.kind is None:
+            sink.seek(0)
+    except Exception:
+        sink.discard()
+        raise
+    return sink
+
+def receive_upload(file, batch=False):
+    """Stored upload for a request file field: unique name, path, hash and size
+    
+    A rejected part of a batch request comes back with only its names and the error.
+    """
+    sink = file.stream
+    
+    if not isinstance(sink, UploadSink):
+        sink = copy_to_upload_sink(file.filename, file.stream, batch)
+    
+    if sink.kind is None:
+        sink.seek(0)
+    sink.close()
+    
+    if sink.error is not None:
+        return {'filename': sink.filename, 'original_filename': sink.original_filename, 'error': sink.error}
+    
+    return {
+        'filename': sink.filename,
+        'original_filename': sink.original_filename,
+        'path': sink.path,
+        'kind': sink.kind,
+        'sha256': sink.sha256.hexdigest(),
+        'size_bytes': sink.size
+    }
+
+def extract_batch_archive(archive_path):
+    """Image members of a zip archive, stored one by one through the upload checks"""
+    items = []
+    extracted_bytes = 0
+    
+    with zipfile.ZipFile(archive_path) as archive:
+        for member in archive.infolist():
+            if member.is_dir():
+                continue
+            
+            filename = os.path.basename(member.filename)
+            if UPLOAD_EXTENSION_KINDS.get(filename.rsplit('.', 1)[-1].lower()) != 'image':
+                items.append({'filename': filename, 'error': 'Unsupported file type'})
+                continue
+            
+            if len(items) >= BATCH_MAX_FILES or extracted_bytes + member.file_size > BATCH_MAX_EXTRACTED_BYTES:
+                items.append({'filename': filename, 'error': 'Archive exceeds the batch limits'})
+                break
+            
+            try:
+                with archive.open(member) as member_stream:
+                    sink = copy_to_upload_sink(filename, member_stream)
+                sink.close()
+            except HTTPException as e:
+                items.append({'filename': filename, 'error': e.description})
+                continue
+            except (zipfile.BadZipFile, OSError) as e:
+                items.append({'filename': filename, 'error': str(e)})
+                continue
+            
+            extracted_bytes += sink.size
+            items.append({
+                'filename': sink.filename,
+                'original_filename': sink.original_filename,
+                'path': sink.path,
+                'kind': sink.kind,
+                'sha256': sink.sha256.hexdigest(),
+                'size_bytes': sink.size
+            })
+    
+    return items
+
+def analyse_batch_image(image_path, output_path, quality):
+    """One batch image on the inference worker: read, detect, optionally write the annotated copy"""
+    stage_start = time.perf_counter()
+    image = cv.imread(image_path)
+    record_stage('decode', stage_start)
+    if image is None:
+        raise ValueError("Unreadable image")
+    
+    processed_image, detections = detect_persons_with_attention(image, mode="upload", quality=quality)
+    if output_path:
+        stage_start = time.perf_counter()
+        cv.imwrite(output_path, processed_image)
+        record_stage('encode', stage_start)
+    return detections
+
 # Flask Routes
+@application.before_request
+def start_request_timing():
+    """Per-request stage timing for the frame and upload endpoints"""
+    if request.endpoint not in TIMED_ENDPOINTS:
+        return
+    
+    g.request_start = time.perf_counter()
+    g.outer_stage_timings = current_stage_timings()
+    g.stage_timings = start_stage_timing()
+    
+    # Body multipart di-stream ke disk saat request.files pertama kali dibaca
+    if request.method == 'POST' and request.mimetype == 'multipart/form-data':
+        stage_start = time.perf_counter()
+        request.files
+        record_stage('receive', stage_start)
+
+@application.before_request
+def ensure_worker_warmup():
+    """Warm up on the first request when the server has no post-fork hook"""
+    if worker_readiness['pid'] != os.getpid():
+        start_worker_warmup()
+
+@application.before_request
+def check_session_affinity():
+    """Reject live requests that a load balancer routed away from the node serving the session"""
+    if request.endpoint not in LIVE_SESSION_ENDPOINTS or request.endpoint == 'start_monitoring':
+        return
+    
+    token = request.headers.get(SESSION_AFFINITY_HEADER)
+    if not token:
+        return
+    
+    node, _, session_id = token.rpartition(':')
+    if node != NODE_ID:
+        return jsonify({
+            "error": "Live session is served by another node",
+            "node": node,
+            "session_id": session_id
+        }), 421
+    return
+
+@application.before_request
+def resume_stored_session():
+    """Pick up an in-progress live session once per worker process"""
+    if request.endpoint in PROBE_ENDPOINTS:
+        return
+    if session_store_state['recovered_pid'] != os.getpid():
+        recover_live_session()
+
+@application.after_request
+def add_server_timing(response):
+    """Server-Timing header, and a "timing" field in JSON bodies when ?timing=1"""
+    timings = g.get('stage_timings')
+    if timings is None or response.is_streamed:
+        return response
+    
+    total_ms = (time.perf_counter() - g.request_start) * 1000
+    response.headers['Server-Timing'] = format_server_timing(timings, total_ms)
+    
+    if request.args.get('timing') == '1' and response.is_json:
+        data = response.get_json()
+        if isinstance(data, dict):
+            data['timing'] = {stage: {'ms': round(total, 2), 'count': count}
+                              for stage, (total, count) in timings.items()}
+            data['timing']['total'] = {'ms': round(total_ms, 2), 'count': 1}
+            response.set_data(application.json.dumps(data))
+    return response
+
+@application.teardown_request
+def count_profiled_request(error=None):
+    """Stop a request-bounded profile after its last request"""
+    if request.endpoint is None or request.endpoint.startswith('admin_'):
+        return
+    
+    with profiler_lock:
+        if profiler_state['running'] and profiler_state['requests_left'] is not None:
+            profiler_state['requests_left'] -= 1
+            if profiler_state['requests_left'] <= 0:
+                profiler_state['running'] = False
+                profiler_state['stopped'] = time.time()
+
+@application.teardown_request
+def stop_request_timing(error=None):
+    if 'stage_timings' not in g:
+        return
+    
+    # Timing request digabung ke pengukur luar (mis. benchmark lewat test client)
+    outer_timings = g.pop('outer_stage_timings', None)
+    if outer_timings is not None:
+        with stage_timing_lock:
+            for stage, (total, count) in g.stage_timings.items():
+                entry = outer_timings.setdefault(stage, [0.0, 0])
+                entry[0] += total
+                entry[1] += count
+    stage_timing_local.timings = outer_timings
+
+@application.errorhandler(413)
+@application.errorhandler(415)
+def upload_rejected(error):
+    """Rejected uploads: JSON for the API, the upload form otherwise"""
+    if request.path.startswith('/api/'):
+        return jsonify({"error": error.description}), error.code
+    return render_template('upload.html', error=error.description), error.code
+
 @application.route('/')
 def index():
     return render_template('index.html')
@@ -1290,25 +4108,32 @@ def upload():
             return render_template('upload.html', error='No selected file')
         
         if file:
-            filename = secure_filename(file.filename)
-            file_path = os.path.join(application.config['UPLOAD_FOLDER'], filename)
-            file.save(file_path)
+            upload_info = receive_upload(file)
+            filename = upload_info['filename']
+            file_path = upload_info['path']
             
             file_ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
             
             result = {
-                "filename": filename,
+                "filename": upload_info['original_filename'],
                 "file_path": f"/static/uploads/{filename}",
+                "sha256": upload_info['sha256'],
+                "size_bytes": upload_info['size_bytes'],
                 "detections": []
             }
             
             if file_ext in ['jpg', 'jpeg', 'png', 'bmp']:
+                stage_start = time.perf_counter()
                 image = cv.imread(file_path)
-                processed_image, detections = detect_persons_with_attention(image, mode="upload")
+                record_stage('decode', stage_start)
+                processed_image, detections = run_inference(detect_persons_with_attention, image, mode="upload",
+                                                           quality=DEGRADATION_LEVELS[0], priority="upload")
                 
                 output_filename = f"processed_{filename}"
                 output_path = os.path.join(application.config['DETECTED_FOLDER'], output_filename)
+                stage_start = time.perf_counter()
                 cv.imwrite(output_path, processed_image)
+                record_stage('encode', stage_start)
                 
                 result["processed_image"] = f"/static/detected/{output_filename}"
                 result["detections"] = detections
@@ -1317,22 +4142,28 @@ def upload():
                 pdf_filename = f"report_{filename}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
                 pdf_path = os.path.join(application.config['REPORTS_FOLDER'], pdf_filename)
                 
-                file_info = {'filename': filename, 'type': file_ext.upper()}
+                file_info = {'filename': upload_info['original_filename'], 'type': file_ext.upper()}
                 generate_upload_pdf_report(detections, file_info, pdf_path)
                 result["pdf_report"] = f"/static/reports/{pdf_filename}"
                 
             elif file_ext in ['mp4', 'avi', 'mov', 'mkv']:
-                output_path, detections = process_video_file(file_path)
+                summary = create_detection_summary()
+                tracker = create_person_tracker()
+                output_path, detections = process_video_file(file_path, summary=summary, tracker=tracker,
+                                                             profile=request.form.get('profile'))
+                tracks = finalize_person_tracks(tracker)
                 
-                result["processed_video"] = f"/static/detected/{os.path.basename(output_path)}"
+                result["processed_video"] = f"/static/detected/{os.path.basename(output_path)}" if output_path else None
+                result["encoding"] = summary['encoding']
                 result["detections"] = detections
+                result["tracks"] = tracks
                 result["type"] = "video"
                 
                 pdf_filename = f"report_{filename}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
                 pdf_path = os.path.join(application.config['REPORTS_FOLDER'], pdf_filename)
                 
-                file_info = {'filename': filename, 'type': file_ext.upper()}
-                generate_upload_pdf_report(detections, file_info, pdf_path)
+                file_info = {'filename': upload_info['original_filename'], 'type': file_ext.upper()}
+                generate_upload_pdf_report(detections, file_info, pdf_path, summary=summary, tracks=tracks)
                 result["pdf_report"] = f"/static/reports/{pdf_filename}"
             
             return render_template('result.html', result=result)
@@ -1351,10 +4182,26 @@ def start_monitoring():
     
     try:
         request_data = request.get_json() or {}
-        client_session_id = request_data.get('sessionId')
+        client_session_id = request_data.get('sessionId') or f"session_{uuid.uuid4().hex[:12]}"
         
-        with monitoring_lock:
-            if live_monitoring_active:
+        with live_session_scope():
+            if live_monitoring_active and session_data.get('session_id') == client_session_id:
+                # Sesi yang dipulihkan dari store setelah worker restart
+                return with_session_affinity(jsonify({
+                    "status": "success",
+                    "message": "Session resumed",
+                    "resumed": True,
+                    "session_id": client_session_id,
+                    "affinity_token": session_affinity_token(client_session_id),
+                    "thresholds": DISTRACTION_THRESHOLDS,
+                    "alert_cooldown": ALERT_COOLDOWN
+                }), client_session_id)
+            
+            if live_monitoring_active and session_data.get('session_id') == session_store_state['recovered_session']:
+                # Client sesi yang dipulihkan tidak kembali, sesi baru menggantikannya
+                persist_session_event('abandon', session_data['session_id'], None)
+                logger.info(f"Recovered session {session_data['session_id']} replaced by {client_session_id}")
+            elif live_monitoring_active:
                 return jsonify({"status": "error", "message": "Monitoring already active"})
             
             # Reset semua variable 
@@ -1378,7 +4225,10 @@ def start_monitoring():
                 'client_alerts': [],
                 'frame_counter': 0,
                 'frame_timestamps': [],
-                'total_frames_processed': 0
+                'total_frames_processed': 0,
+                'frames_recorded': 0,
+                'detections_count': 0,
+                'user_label': request_data.get('userLabel')
             }
             
             current_person_state = None
@@ -1394,18 +4244,29 @@ def start_monitoring():
                 'total_duration': 0
             }
             
+            reset_frame_change_state()
+            reset_frame_admission()
+            start_session_capture(client_session_id)
+            
+            checkpoint = session_checkpoint()
+            persist_session_event('start', client_session_id, dict(checkpoint, start_time=session_start_time))
+            session_store_state['last_checkpoint'] = session_start_time
+            session_store_state['recovered_session'] = None
+            
             live_monitoring_active = True
             recording_active = True
+            publish_session_status()
             
             logger.info(f"Monitoring session started: {session_data['start_time']} (ID: {client_session_id})")
             
-            return jsonify({
+            return with_session_affinity(jsonify({
                 "status": "success", 
                 "message": "Session started", 
                 "session_id": client_session_id,
+                "affinity_token": session_affinity_token(client_session_id),
                 "thresholds": DISTRACTION_THRESHOLDS,
                 "alert_cooldown": ALERT_COOLDOWN
-            })
+            }), client_session_id)
         
     except Exception as e:
         logger.error(f"Start monitoring error: {str(e)}")
@@ -1423,7 +4284,7 @@ def stop_monitoring():
         client_alerts = request_data.get('alerts', [])
         client_session_id = request_data.get('sessionId')
         
-        with monitoring_lock:
+        with live_session_scope():
             if not live_monitoring_active and (not session_data or not session_data.get('start_time')):
                 return jsonify({"status": "error", "message": "Monitoring not active"})
             
@@ -1447,6 +4308,13 @@ def stop_monitoring():
             live_monitoring_active = False
             recording_active = False
             session_data['end_time'] = datetime.now()
+            publish_session_status()
+            finish_session_capture(session_data['alerts'], session_data['focus_statistics'])
+            
+            if session_backend.shared:
+                # Frame rekaman tersebar di semua worker
+                session_data['recording_frames'], session_data['frame_timestamps'] = collect_shared_recording(
+                    session_data['session_id'], session_data.get('frames_recorded', 0))
             
             logger.info(f"Monitoring session stopped: {session_data['end_time']} (ID: {client_session_id})")
             
@@ -1500,6 +4368,15 @@ def stop_monitoring():
                 logger.error(f"Video generation error: {str(video_error)}")
                 traceback.print_exc()
             
+            persist_session_event('finish', session_data['session_id'], dict(
+                session_checkpoint(),
+                end_time=session_data['end_time'].timestamp(),
+                recording_path=session_data.get('recording_path'),
+                report_path=os.path.join(application.config['REPORTS_FOLDER'], os.path.basename(response_data['pdf_report']))
+                if response_data.get('pdf_report') else None,
+                history=session_history_record()
+            ))
+            
             return jsonify(response_data)
         
     except Exception as e:
@@ -1513,58 +4390,111 @@ def process_frame():
     global session_data
     
     try:
+        arrival_time = time.time()
         data = request.get_json()
         if not data or 'frame' not in data:
             return jsonify({"error": "No frame data"}), 400
             
-        frame_data = data['frame'].split(',')[1]
-        frame_bytes = base64.b64decode(frame_data)
-        nparr = np.frombuffer(frame_bytes, np.uint8)
-        frame = cv.imdecode(nparr, cv.IMREAD_COLOR)
+        stage_start = time.perf_counter()
+        ticket = admit_frame()
+        record_stage('admission_wait', stage_start)
+        if ticket is None:
+            increment_counter('frames_dropped')
+            capture_frame_request(arrival_time, data['frame'], (time.time() - arrival_time) * 1000, dropped=True)
+            return jsonify({
+                "success": False,
+                "dropped": True,
+                "message": "Frame superseded by a newer frame",
+                "backpressure": get_backpressure_hints()
+            }), 429
         
-        if frame is None:
-            return jsonify({"error": "Invalid frame"}), 400
+        processing_start = time.time()
+        try:
+            stage_start = time.perf_counter()
+            frame_data = data['frame'].split(',')[1]
+            frame_bytes = base64.b64decode(frame_data)
+            record_stage('base64_decode', stage_start)
+            
+            stage_start = time.perf_counter()
+            nparr = np.frombuffer(frame_bytes, np.uint8)
+            frame = cv.imdecode(nparr, cv.IMREAD_COLOR)
+            record_stage('decode', stage_start)
         
-        processed_frame, detections = detect_persons_with_attention(frame, mode="video")
+            if frame is None:
+                return jsonify({"error": "Invalid frame"}), 400
         
-        # Store frame
-        with monitoring_lock:
-            if live_monitoring_active and recording_active and session_data:
-                session_data['frame_counter'] = session_data.get('frame_counter', 0) + 1
-                session_data['total_frames_processed'] = session_data.get('total_frames_processed', 0) + 1
-                current_timestamp = time.time()
-                
-                should_store_frame = (
-                    session_data['frame_counter'] % FRAME_STORAGE_INTERVAL == 0 or
-                    len(detections) > 0 or
-                    len(session_data.get('recording_frames', [])) < 10
-                )
+            # Decode dan inferensi berjalan di luar lock sesi lintas worker
+            analysis = analyse_live_frame(frame)
+            
+            acquire_live_session()
+            try:
+                processed_frame, detections, frame_reused = detect_live_frame(frame, analysis)
+                increment_counter('frames_processed')
+                if frame_reused:
+                    increment_counter('frames_reused')
                 
-                if should_store_frame:
-                    frame_copy = processed_frame.copy()
-                    session_data['recording_frames'].append(frame_copy)
-                    session_data['frame_timestamps'].append(current_timestamp)
+                # Store frame
+                with timed_lock(monitoring_lock):
+                    if live_monitoring_active and recording_active and session_data:
+                        session_data['frame_counter'] = session_data.get('frame_counter', 0) + 1
+                        session_data['total_frames_processed'] = session_data.get('total_frames_processed', 0) + 1
+                        current_timestamp = time.time()
                     
-                    if len(session_data['recording_frames']) > MAX_STORED_FRAMES:
-                        frames_to_remove = len(session_data['recording_frames']) - MAX_STORED_FRAMES
-                        session_data['recording_frames'] = session_data['recording_frames'][frames_to_remove:]
-                        session_data['frame_timestamps'] = session_data['frame_timestamps'][frames_to_remove:]
-        
-        if live_monitoring_active and detections:
-            update_session_statistics(detections)
+                        should_store_frame = (
+                            session_data['frame_counter'] % FRAME_STORAGE_INTERVAL == 0 or
+                            len(detections) > 0 or
+                            recorded_frame_count() < 10
+                        )
+                    
+                        if should_store_frame:
+                            frame_copy = processed_frame.copy()
+                            session_data['recording_frames'].append(frame_copy)
+                            session_data['frame_timestamps'].append(current_timestamp)
+                            session_data['frames_recorded'] = min(session_data.get('frames_recorded', 0) + 1, MAX_STORED_FRAMES)
+                            persist_session_event('frame', session_data['session_id'],
+                                                  {'t': current_timestamp, 'frame': frame_copy})
+                        
+                            if len(session_data['recording_frames']) > MAX_STORED_FRAMES:
+                                frames_to_remove = len(session_data['recording_frames']) - MAX_STORED_FRAMES
+                                session_data['recording_frames'] = session_data['recording_frames'][frames_to_remove:]
+                                session_data['frame_timestamps'] = session_data['frame_timestamps'][frames_to_remove:]
+                
+                if live_monitoring_active and detections:
+                    update_session_statistics(detections)
+                if live_monitoring_active:
+                    checkpoint_session()
+                    publish_monitoring_snapshot()
+                
+                frame_count = recorded_frame_count() if session_data else 0
+                total_processed = session_data.get('total_frames_processed', 0) if session_data else 0
+                frame_number = session_data.get('frame_counter', 0) if session_data else 0
+            finally:
+                release_live_session()
         
-        # Encode frame
-        _, buffer = cv.imencode('.jpg', processed_frame, [cv.IMWRITE_JPEG_QUALITY, 85])
-        processed_frame_b64 = base64.b64encode(buffer).decode('utf-8')
+            # Encode frame
+            stage_start = time.perf_counter()
+            _, buffer = cv.imencode('.jpg', processed_frame, [cv.IMWRITE_JPEG_QUALITY, 85])
+            record_stage('encode', stage_start)
+            
+            stage_start = time.perf_counter()
+            processed_frame_b64 = base64.b64encode(buffer).decode('utf-8')
+            record_stage('base64_encode', stage_start)
+            
+            capture_frame_request(arrival_time, data['frame'], (time.time() - arrival_time) * 1000,
+                                  detections=detections, reused=frame_reused)
         
-        return jsonify({
-            "success": True,
-            "processed_frame": f"data:image/jpeg;base64,{processed_frame_b64}",
-            "detections": detections,
-            "frame_count": len(session_data.get('recording_frames', [])) if session_data else 0,
-            "total_processed": session_data.get('total_frames_processed', 0) if session_data else 0,
-            "frame_number": session_data.get('frame_counter', 0) if session_data else 0
-        })
+            return jsonify({
+                "success": True,
+                "processed_frame": f"data:image/jpeg;base64,{processed_frame_b64}",
+                "detections": detections,
+                "frame_count": frame_count,
+                "total_processed": total_processed,
+                "frame_number": frame_number,
+                "frame_reused": frame_reused,
+                "backpressure": get_backpressure_hints()
+            })
+        finally:
+            release_frame((time.time() - processing_start) * 1000)
         
     except Exception as e:
         logger.error(f"Frame processing error: {str(e)}")
@@ -1579,9 +4509,10 @@ def sync_alerts():
         client_alerts = request_data.get('alerts', [])
         session_id = request_data.get('sessionId')
         
-        with monitoring_lock:
+        with live_session_scope():
             if session_data and session_data.get('session_id') == session_id:
                 session_data['client_alerts'] = client_alerts
+                checkpoint_session(force=True)
                 logger.info(f"Synced {len(client_alerts)} client alerts session {session_id}")
                 return jsonify({"status": "success", "synced_count": len(client_alerts)})
             else:
@@ -1593,59 +4524,13 @@ def sync_alerts():
 
 @application.route('/get_monitoring_data')
 def get_monitoring_data():
-    """Get monitoring data"""
-    global session_data
-    
+    """Get monitoring data from the snapshot published by the frame path"""
     try:
-        with monitoring_lock:
-            if not live_monitoring_active:
-                return jsonify({"error": "Monitoring not active"})
-            
-            current_alerts = session_data.get('alerts', []) if session_data else []
-            recent_alerts = current_alerts[-5:] if current_alerts else []
-            
-            formatted_alerts = []
-            for alert in recent_alerts:
-                try:
-                    alert_time = datetime.fromisoformat(alert['timestamp']).strftime('%H:%M:%S')
-                except:
-                    alert_time = alert.get('alert_time', 'N/A')
-                
-                duration = alert.get('real_time_duration', alert.get('duration', 0))
-                is_reminder = alert.get('is_reminder', False)
-                duration_text = f" ({duration:.1f}s)" if duration > 0 else ""
-                
-                formatted_alerts.append({
-                    'time': alert_time,
-                    'message': alert['message'] + duration_text,
-                    'type': 'warning' if alert['detection'] in ['YAWNING', 'NOT FOCUSED'] else 'error',
-                    'duration': duration,
-                    'is_reminder': is_reminder
-                })
-            
-            current_detections = session_data.get('detections', []) if session_data else []
-            recent_detections = current_detections[-10:] if current_detections else []
-            current_status = 'READY'
-            focused_count = 0
-            total_persons = 0
-            
-            if recent_detections:
-                latest_detection = recent_detections[-1]
-                current_status = latest_detection['status']
-                total_persons = 1
-                focused_count = 1 if current_status == 'FOCUSED' else 0
-            elif no_person_state.get('active', False):
-                current_status = 'NO PERSON'
-            
-            return jsonify({
-                'total_persons': total_persons,
-                'focused_count': focused_count,
-                'alert_count': len(current_alerts),
-                'current_status': current_status,
-                'latest_alerts': formatted_alerts,
-                'frame_count': len(session_data.get('recording_frames', [])) if session_data else 0,
-                'total_processed': session_data.get('total_frames_processed', 0) if session_data else 0
-            })
+        snapshot = current_monitoring_snapshot()
+        if not snapshot['active']:
+            return jsonify({"error": "Monitoring not active"})
+        
+        return Response(snapshot['monitoring_data_json'], mimetype='application/json')
         
     except Exception as e:
         logger.error(f"Get monitoring data error: {str(e)}")
@@ -1656,17 +4541,26 @@ def get_monitoring_data():
 def monitoring_status():
     """Get monitoring status"""
     try:
-        with monitoring_lock:
-            return jsonify({
-                "is_active": live_monitoring_active,
-                "session_id": session_data.get('session_id') if session_data else None,
-                "alerts_count": len(session_data.get('alerts', [])) if session_data else 0,
-                "frames_stored": len(session_data.get('recording_frames', [])) if session_data else 0,
-                "frames_processed": session_data.get('total_frames_processed', 0) if session_data else 0,
-                "no_person_active": no_person_state.get('active', False),
-                "alert_cooldown": ALERT_COOLDOWN,
-                "thresholds": DISTRACTION_THRESHOLDS,
-            })
+        snapshot = current_monitoring_snapshot()
+        return jsonify({
+            "is_active": snapshot['active'],
+            "session_id": snapshot['session_id'],
+            "alerts_count": snapshot['alerts_count'],
+            "frames_stored": snapshot['frames_stored'],
+            "frames_processed": snapshot['frames_processed'],
+            "frames_reused": frame_change_state.get('frames_reused', 0),
+            "frames_dropped": frame_admission.get('frames_dropped', 0),
+            "no_person_active": snapshot['no_person_active'],
+            "alert_cooldown": ALERT_COOLDOWN,
+            "thresholds": DISTRACTION_THRESHOLDS,
+            "degradation": get_degradation_status(),
+            "scheduler": get_scheduler_status(),
+            "session_store": get_session_store_status(),
+            "session_backend": session_backend.name,
+            "node": NODE_ID,
+            # frames_reused, frames_dropped, degradation dan scheduler milik worker ini
+            "pid": os.getpid(),
+        })
     except Exception as e:
         logger.error(f"Monitoring status error: {str(e)}")
         return jsonify({"is_active": False})
@@ -1680,14 +4574,42 @@ def check_camera():
         logger.error(f"Camera check error: {str(e)}")
         return jsonify({"camera_available": False})
 
+@application.route('/livez')
+def liveness():
+    """Liveness probe: answers from the status snapshot without taking any lock"""
+    status = worker_status
+    return jsonify({"alive": True, "pid": status['pid'], "uptime_seconds": round(time.time() - status['started'], 1)})
+
+@application.route('/ready')
+def readiness():
+    """Readiness probe: 200 once this worker's models are built and warmed up"""
+    status = worker_status
+    if not status['ready']:
+        return jsonify({"ready": False, "error": status['warmup_error']}), 503
+    return jsonify({"ready": True, "pid": status['pid'], "warmup_ms": status['warmup_ms']})
+
 @application.route('/health')
 def health_check():
-    """Health check endpoint"""
+    """Health check from the status snapshot, never waits for a busy live session"""
+    status = worker_status
+    return jsonify({
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "pid": status['pid'],
+        "ready": status['ready'],
+        "monitoring_active": status['monitoring_active'],
+        "session_id": status['session_id'],
+        "status_age_seconds": round(time.time() - status['updated'], 3)
+    })
+
+@application.route('/diagnostics')
+def diagnostics():
+    """Detailed session, directory and model diagnostics (takes monitoring_lock)"""
     try:
         with monitoring_lock:
             return jsonify({
-                "status": "healthy", 
                 "timestamp": datetime.now().isoformat(),
+                "worker": dict(worker_status),
                 "directories": {
                     "uploads": os.path.exists(application.config['UPLOAD_FOLDER']),
                     "detected": os.path.exists(application.config['DETECTED_FOLDER']),
@@ -1699,25 +4621,138 @@ def health_check():
                 "recording_frames": len(session_data.get('recording_frames', [])) if session_data else 0,
                 "total_frames_processed": session_data.get('total_frames_processed', 0) if session_data else 0,
                 "frame_storage_ratio": len(session_data.get('recording_frames', [])) / max(1, session_data.get('total_frames_processed', 1)) * 100 if session_data else 0,
-                "mediapipe_status": "initialized" if face_detection and face_mesh else "error",
+                "mediapipe_status": "initialized" if face_detection and face_mesh else "not initialized",
                 "no_person_state": no_person_state,
                 "alert_cooldown": ALERT_COOLDOWN,
                 "thresholds": DISTRACTION_THRESHOLDS,
-                "audio_system": {
-                    "enabled": True,
-                    "speech_synthesis": True,
-                    "beep_alerts": True,
-                    "status": "ready"
-                }
+                "session_store": get_session_store_status(),
+                "session_backend": session_backend.name
             })
     except Exception as e:
-        logger.error(f"Health check error: {str(e)}")
+        logger.error(f"Diagnostics error: {str(e)}")
         return jsonify({
             "status": "error",
             "error": str(e),
             "timestamp": datetime.now().isoformat()
         }), 500
 
+@application.route('/metrics')
+def metrics():
+    """Metrics in the Prometheus text format"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+@application.route('/admin/profile', methods=['POST'])
+@admin_required
+def admin_profile_start():
+    """Start sampling CPU profiling for ?seconds=N or the next ?requests=N requests"""
+    seconds = request.args.get('seconds', type=float)
+    requests_count = request.args.get('requests', type=int)
+    if not start_profiler(seconds, requests_count, include_idle=request.args.get('idle') == '1'):
+        return jsonify({"error": "Profiler already running", "profiler": get_profiler_status()}), 409
+    return jsonify({"status": "started", "profiler": get_profiler_status()})
+
+@application.route('/admin/profile', methods=['GET'])
+@admin_required
+def admin_profile_result():
+    """Collapsed stacks (flamegraph format) of the last profile, or its status while running"""
+    status = get_profiler_status()
+    if status['running'] or request.args.get('format') == 'json':
+        return jsonify(status)
+    
+    with profiler_lock:
+        stacks = sorted(profiler_state['stacks'].items(), key=lambda item: -item[1])
+    return Response("".join(f"{stack} {count}\n" for stack, count in stacks), mimetype='text/plain')
+
+@application.route('/admin/tracemalloc', methods=['POST'])
+@admin_required
+def admin_tracemalloc_control():
+    """Start (?frames=N) or stop (?action=stop) tracemalloc"""
+    if request.args.get('action') == 'stop':
+        tracemalloc.stop()
+        return jsonify({"tracing": False})
+    
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(request.args.get('frames', TRACEMALLOC_FRAMES, type=int))
+    return jsonify({"tracing": True})
+
+@application.route('/admin/tracemalloc', methods=['GET'])
+@admin_required
+def admin_tracemalloc_snapshot():
+    """Top allocators of a tracemalloc snapshot (?top=N, ?group=lineno|traceback)"""
+    if not tracemalloc.is_tracing():
+        return jsonify({"error": "tracemalloc is not running, POST /admin/tracemalloc first"}), 409
+    
+    top = request.args.get('top', 20, type=int)
+    group = 'traceback' if request.args.get('group') == 'traceback' else 'lineno'
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__)
+    ])
+    current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    
+    return jsonify({
+        "traced_bytes": current_bytes,
+        "peak_bytes": peak_bytes,
+        "top": [{
+            "size_bytes": stat.size,
+            "count": stat.count,
+            "traceback": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback]
+        } for stat in snapshot.statistics(group)[:top]]
+    })
+
+@application.route('/admin/memory', methods=['GET'])
+@admin_required
+def admin_memory():
+    """Per-session memory accounting"""
+    return jsonify(get_session_memory())
+
+@application.route('/api/analytics')
+def api_analytics():
+    """Focus trends across finished sessions (?days=30 or ?from=&to=, ?group=day|week|month|user, ?user=)"""
+    if not SESSION_STORE_PATH:
+        return jsonify({"error": "Session store disabled"}), 404
+    
+    try:
+        return jsonify(get_session_analytics(request.args))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@application.route('/api/analytics/sessions')
+def api_analytics_sessions():
+    """Finished sessions in a date range, newest first"""
+    if not SESSION_STORE_PATH:
+        return jsonify({"error": "Session store disabled"}), 404
+    
+    try:
+        where, params, query_range = analytics_filters(request.args)
+        limit = analytics_limit(request.args, 'limit', 100)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    sessions = query_session_store(
+        f"SELECT * FROM session_history WHERE {where} ORDER BY session_date DESC, start_time DESC LIMIT ?",
+        params + [limit])
+    return jsonify({"range": query_range, "sessions": sessions})
+
+@application.route('/api/analytics/sessions/<session_id>')
+def api_analytics_session(session_id):
+    """Aggregates, state timeline and alert log of one session"""
+    if not SESSION_STORE_PATH:
+        return jsonify({"error": "Session store disabled"}), 404
+    
+    history = query_session_store("SELECT * FROM session_history WHERE session_id = ?", (session_id,))
+    if not history:
+        return jsonify({"error": "Session not found"}), 404
+    
+    timeline = query_session_store("SELECT t, status FROM session_timeline WHERE session_id = ? ORDER BY t",
+                                   (session_id,))
+    alerts = query_session_store("SELECT alert FROM session_alerts WHERE session_id = ? ORDER BY id", (session_id,))
+    
+    return jsonify({
+        "session": history[0],
+        "timeline": timeline,
+        "alerts": [json.loads(row['alert']) for row in alerts]
+    })
+
 @application.route('/api/detect', methods=['POST'])
 def api_detect():
     """API endpoint"""
@@ -1729,37 +4764,167 @@ def api_detect():
     if file.filename == '':
         return jsonify({"error": "No selected file"}), 400
     
-    filename = secure_filename(file.filename)
-    file_path = os.path.join(application.config['UPLOAD_FOLDER'], filename)
-    file.save(file_path)
+    upload_info = receive_upload(file)
+    filename = upload_info['filename']
+    file_path = upload_info['path']
+    upload_meta = {
+        "filename": upload_info['original_filename'],
+        "sha256": upload_info['sha256'],
+        "size_bytes": upload_info['size_bytes']
+    }
     
     file_ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
     
     if file_ext in ['jpg', 'jpeg', 'png', 'bmp']:
+        stage_start = time.perf_counter()
         image = cv.imread(file_path)
-        processed_image, detections = detect_persons_with_attention(image, mode="upload")
+        record_stage('decode', stage_start)
+        processed_image, detections = run_inference(detect_persons_with_attention, image, mode="upload",
+                                                    quality=DEGRADATION_LEVELS[0], priority="upload")
         
         output_filename = f"processed_{filename}"
         output_path = os.path.join(application.config['DETECTED_FOLDER'], output_filename)
+        stage_start = time.perf_counter()
         cv.imwrite(output_path, processed_image)
+        record_stage('encode', stage_start)
         
         return jsonify({
             "type": "image",
+            "upload": upload_meta,
             "processed_image": f"/static/detected/{output_filename}",
             "detections": detections
         })
         
     elif file_ext in ['mp4', 'avi', 'mov', 'mkv']:
-        output_path, detections = process_video_file(file_path)
+        profile = request.args.get('profile') or request.form.get('profile')
         
-        return jsonify({
+        # Mode streaming NDJSON
+        if request.args.get('stream') == '1' or 'application/x-ndjson' in request.headers.get('Accept', ''):
+            return Response(stream_with_context(stream_video_analysis(file_path, profile)),
+                            mimetype='application/x-ndjson')
+        
+        summary = create_detection_summary()
+        tracker = create_person_tracker()
+        output_path, detections = process_video_file(file_path, summary=summary, tracker=tracker, profile=profile)
+        
+        response_data = {
             "type": "video",
-            "processed_video": f"/static/detected/{os.path.basename(output_path)}",
-            "detections": detections
-        })
+            "upload": upload_meta,
+            "processed_video": f"/static/detected/{os.path.basename(output_path)}" if output_path else None,
+            "total_detections": summary['total_detections'],
+            "status_counts": summary['status_counts'],
+            "tracks": finalize_person_tracks(tracker),
+            "encoding": summary['encoding']
+        }
+        
+        # Daftar deteksi per frame dapat dihilangkan dengan ?detections=none
+        if request.args.get('detections') != 'none':
+            response_data["detections"] = detections
+        
+        return jsonify(response_data)
     
     return jsonify({"error": "Unsupported file format"}), 400
 
+@application.route('/api/detect/batch', methods=['POST'])
+def api_detect_batch():
+    """Batch API endpoint for many images (multipart files and/or zip archives)"""
+    uploads = [file for file in request.files.getlist('files') + request.files.getlist('file') if file.filename]
+    if not uploads:
+        return jsonify({"error": "No file part"}), 400
+    
+    batch_id = uuid.uuid4().hex[:12]
+    annotate = request.args.get('annotate') == '1'
+    with_report = request.args.get('report') == '1' or request.form.get('report') == '1'
+    
+    items = []
+    for file in uploads:
+        upload_info = receive_upload(file, batch=True)
+        if 'error' in upload_info:
+            items.append({'filename': upload_info['original_filename'], 'error': upload_info['error']})
+        elif upload_info['kind'] == 'archive':
+            try:
+                items.extend(extract_batch_archive(upload_info['path']))
+            except zipfile.BadZipFile:
+                items.append({'filename': upload_info['original_filename'], 'error': 'Invalid zip archive'})
+            os.remove(upload_info['path'])
+        elif upload_info['kind'] == 'image':
+            items.append(upload_info)
+        else:
+            os.remove(upload_info['path'])
+            items.append({'filename': upload_info['original_filename'],
+                          'error': 'Only images and zip archives are accepted in a batch'})
+        
+        if len(items) > BATCH_MAX_FILES:
+            break
+    
+    if len(items) > BATCH_MAX_FILES:
+        # Part dan isi arsip yang sudah tersimpan dihapus, termasuk part yang belum diperiksa
+        for item in items:
+            if 'path' in item and os.path.exists(item['path']):
+                os.remove(item['path'])
+        for file in uploads:
+            if isinstance(file.stream, UploadSink):
+                file.stream.discard()
+        return jsonify({"error": f"Batch exceeds {BATCH_MAX_FILES} files"}), 413
+    
+    # Semua gambar diantrikan sekaligus, dibagi round-robin dengan job upload lain
+    quality = dict(DEGRADATION_LEVELS[0], save_crops=False, draw_overlay=annotate)
+    futures = []
+    for item in items:
+        if 'error' in item:
+            futures.append(None)
+            continue
+        output_path = None
+        if annotate:
+            output_path = os.path.join(application.config['DETECTED_FOLDER'], f"processed_{item['filename']}")
+        futures.append(submit_inference(analyse_batch_image, item['path'], output_path, quality,
+                                        priority="upload", job_id=f"batch-{batch_id}"))
+    
+    summary = create_detection_summary()
+    results = []
+    for item, future in zip(items, futures):
+        entry = {"filename": item.get('original_filename', item['filename'])}
+        if future is None:
+            entry["error"] = item['error']
+            results.append(entry)
+            continue
+        
+        entry["sha256"] = item['sha256']
+        try:
+            detections = future.result()
+        except Exception as e:
+            logger.error(f"Batch image error ({item['filename']}): {str(e)}")
+            entry["error"] = str(e)
+            results.append(entry)
+            continue
+        
+        add_detections_to_summary(summary, detections)
+        entry["detections"] = detections
+        if annotate:
+            entry["processed_image"] = f"/static/detected/processed_{item['filename']}"
+        results.append(entry)
+    
+    failed = sum(1 for entry in results if 'error' in entry)
+    response_data = {
+        "type": "batch",
+        "batch_id": batch_id,
+        "total_files": len(results),
+        "processed": len(results) - failed,
+        "failed": failed,
+        "total_detections": summary['total_detections'],
+        "status_counts": summary['status_counts'],
+        "results": results
+    }
+    
+    if with_report:
+        pdf_filename = f"report_batch_{batch_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+        pdf_path = os.path.join(application.config['REPORTS_FOLDER'], pdf_filename)
+        file_info = {'filename': f"{len(results) - failed} images (batch {batch_id})", 'type': 'BATCH'}
+        generate_upload_pdf_report([], file_info, pdf_path, summary=summary)
+        response_data["pdf_report"] = f"/static/reports/{pdf_filename}"
+    
+    return jsonify(response_data)
+
 # Static file
 @application.route('/static/reports/<filename>')
 def report_file(filename):
@@ -1821,7 +4986,7 @@ def upload_file(filename):
 
 if __name__ == "__main__":
     try:
-        if not init_mediapipe():
+        if not warm_up_worker():
             logger.warning("MediaPipe initialization failed - some features may not work")
         
         port = int(os.environ.get('PORT', 5000))
@@ -0,0 +1,250 @@
+"""Offline batch analysis of a directory of images and videos.
+
+    python batch_analyze.py /data/sessions --output results.jsonl --csv results.csv --workers 4
+
+Every file is analysed with the same pipeline as /upload, on a pool of worker
+processes. Results are appended to the JSONL file as they finish; rerunning the
+same command skips files already recorded there, so an interrupted run resumes.
+"""
+import argparse
+import concurrent.futures
+import csv
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('batch_analyze')
+
+IMAGE_EXTENSIONS = ['jpg', 'jpeg', 'png', 'bmp']
+VIDEO_EXTENSIONS = ['mp4', 'avi', 'mov', 'mkv']
+STATUSES = ['FOCUSED', 'NOT FOCUSED', 'YAWNING', 'SLEEPING']
+CSV_FIELDS = ['path', 'type', 'status', 'total_detections', 'persons'] + STATUSES + ['seconds', 'sha256', 'error']
+
+# Modul app per proses worker
+app = None
+worker_options = {}
+
+def init_worker(options):
+    """Load the detection pipeline once per worker process"""
+    global app, worker_options
+
+    # Worker sudah menjadi pool proses, tidak perlu proses inferensi tambahan
+    os.environ['INFERENCE_PROCESSES'] = '0'
+    import app as app_module
+    app = app_module
+    worker_options = options
+
+    if options['media_dir']:
+        os.makedirs(options['media_dir'], exist_ok=True)
+        app.application.config['DETECTED_FOLDER'] = options['media_dir']
+
+    # Analisis offline selalu memakai kualitas penuh
+    app.pin_quality(0)
+
+    if not app.init_mediapipe():
+        raise RuntimeError("MediaPipe initialization failed")
+
+def file_sha256(path):
+    """Content hash of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def analyse_file(path, relative_path):
+    """Analyse one file in a worker, returning its result record"""
+    start_time = time.time()
+    file_ext = path.rsplit('.', 1)[-1].lower()
+    stat = os.stat(path)
+
+    record = {
+        'path': relative_path,
+        'size_bytes': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': file_sha256(path),
+        'type': 'image' if file_ext in IMAGE_EXTENSIONS else 'video',
+        'status': 'ok'
+    }
+
+    try:
+        summary = app.create_detection_summary()
+
+        if record['type'] == 'image':
+            image = app.cv.imread(path)
+            if image is None:
+                raise ValueError("Unreadable image")
+
+            quality = dict(app.DEGRADATION_LEVELS[0], save_crops=False, draw_overlay=worker_options['annotate'])
+            processed_image, detections = app.detect_persons_with_attention(image, mode="upload", quality=quality)
+            app.add_detections_to_summary(summary, detections)
+
+            if worker_options['annotate']:
+                output_path = os.path.join(app.application.config['DETECTED_FOLDER'],
+                                           f"processed_{record['sha256'][:12]}_{os.path.basename(path)}")
+                app.cv.imwrite(output_path, processed_image)
+                record['processed_image'] = output_path
+            record['detections'] = detections
+            record['persons'] = len(summary['person_counts'])
+        else:
+            tracker = app.create_person_tracker()
+            output_path, _ = app.process_video_file(path, summary=summary, tracker=tracker,
+                                                    profile=worker_options['profile'])
+            tracks = app.finalize_person_tracks(tracker)
+
+            record['processed_video'] = output_path
+            record['encoding'] = summary['encoding']
+            record['tracks'] = tracks
+            record['persons'] = len(tracks)
+
+        record['total_detections'] = summary['total_detections']
+        record['status_counts'] = summary['status_counts']
+    except Exception as e:
+        record['status'] = 'error'
+        record['error'] = str(e)
+
+    record['seconds'] = round(time.time() - start_time, 3)
+    return record
+
+def find_media_files(input_dir, recursive):
+    """Image and video files under input_dir, in a stable order"""
+    files = []
+    for root, dirs, names in os.walk(input_dir):
+        dirs.sort()
+        for name in sorted(names):
+            if name.rsplit('.', 1)[-1].lower() in IMAGE_EXTENSIONS + VIDEO_EXTENSIONS:
+                path = os.path.join(root, name)
+                files.append((path, os.path.relpath(path, input_dir)))
+        if not recursive:
+            break
+    return files
+
+def load_completed(output_path):
+    """(path, size, mtime) of files already recorded successfully in the JSONL output"""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+
+    with open(output_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue   # baris terakhir bisa terpotong saat proses dihentikan
+            if record.get('status') == 'ok':
+                completed.add((record['path'], record['size_bytes'], record['mtime_ns']))
+    return completed
+
+def csv_row(record):
+    """Flat CSV row for a result record"""
+    status_counts = record.get('status_counts', {})
+    row = {field: record.get(field, '') for field in CSV_FIELDS}
+    for status in STATUSES:
+        row[status] = status_counts.get(status, 0)
+    return row
+
+def run_batch(args):
+    files = find_media_files(args.input_dir, args.recursive)
+    completed = load_completed(args.output)
+
+    pending = []
+    for path, relative_path in files:
+        stat = os.stat(path)
+        if (relative_path, stat.st_size, stat.st_mtime_ns) not in completed:
+            pending.append((path, relative_path))
+
+    logger.info(f"{len(files)} files found, {len(files) - len(pending)} already done, {len(pending)} to analyse")
+    if not pending:
+        return 0
+
+    options = {'annotate': args.annotate, 'profile': args.profile, 'media_dir': args.media_dir}
+
+    csv_file = None
+    csv_writer = None
+    if args.csv:
+        write_header = not os.path.exists(args.csv) or os.path.getsize(args.csv) == 0
+        csv_file = open(args.csv, 'a', newline='')
+        csv_writer = csv.DictWriter(csv_file, fieldnames=CSV_FIELDS)
+        if write_header:
+            csv_writer.writeheader()
+
+    done = 0
+    failed = 0
+    start_time = time.time()
+
+    executor = concurrent.futures.ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=init_worker,
+        initargs=(options,)
+    )
+
+    try:
+        with open(args.output, 'a') as output_file:
+            # Batasi jumlah file yang sedang diproses agar hasil tersimpan bertahap
+            queued = iter(pending)
+            in_flight = set()
+
+            while True:
+                for path, relative_path in queued:
+                    in_flight.add(executor.submit(analyse_file, path, relative_path))
+                    if len(in_flight) >= args.workers * 2:
+                        break
+
+                if not in_flight:
+                    break
+
+                finished, in_flight = concurrent.futures.wait(
+                    in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+
+                for future in finished:
+                    record = future.result()
+                    output_file.write(json.dumps(record) + "\n")
+                    output_file.flush()
+                    if csv_writer:
+                        csv_writer.writerow(csv_row(record))
+                        csv_file.flush()
+
+                    done += 1
+                    if record['status'] != 'ok':
+                        failed += 1
+                        logger.warning(f"{record['path']}: {record.get('error')}")
+                    logger.info(f"[{done}/{len(pending)}] {record['path']} ({record['seconds']}s)")
+    except KeyboardInterrupt:
+        logger.warning("Interrupted - rerun the same command to resume")
+        executor.shutdown(wait=False, cancel_futures=True)
+        return 130
+    finally:
+        if csv_file:
+            csv_file.close()
+
+    executor.shutdown()
+
+    elapsed = time.time() - start_time
+    logger.info(f"Analysed {done} files in {elapsed:.1f}s ({failed} failed)")
+    return 1 if failed else 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline batch analysis of images and videos")
+    parser.add_argument('input_dir', help="directory with images and/or videos")
+    parser.add_argument('--output', default='results.jsonl', help="JSONL results file (appended, used for resume)")
+    parser.add_argument('--csv', help="optional CSV summary file (appended)")
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) - 1), help="worker processes")
+    parser.add_argument('--recursive', action='store_true', help="include subdirectories")
+    parser.add_argument('--profile', default='none', help="video output profile (full, preview, analysed, none)")
+    parser.add_argument('--annotate', action='store_true', help="write annotated copies of images")
+    parser.add_argument('--media-dir', help="directory for annotated images and videos")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.input_dir):
+        parser.error(f"not a directory: {args.input_dir}")
+
+    sys.exit(run_batch(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""Benchmark suite for the detection pipeline.
+
+    python benchmark.py --output bench.json
+    python benchmark.py --image tests/face.jpg --video tests/clip.mp4 --iterations 50
+
+Runs every benchmark on fixture media (synthetic frames unless --image/--video are
+given) at full quality and writes one JSON document with wall-clock percentiles and
+per-stage timings (decode, cvtColor, face_detection, face_mesh, model_detect,
+overlay, crop_write, encode), so two builds can be compared with --compare.
+Synthetic frames rarely yield face mesh landmarks, so model_detect is only
+exercised reliably with a real --image/--video fixture.
+"""
+import argparse
+import base64
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import cv2 as cv
+import numpy as np
+
+logging.basicConfig(level=logging.WARNING)
+
+# Benchmark memakai inferensi di proses yang sama agar tahap MediaPipe terukur
+os.environ['INFERENCE_PROCESSES'] = '0'
+# Sesi benchmark tidak ditulis ke session store produksi
+os.environ['SESSION_STORE_PATH'] = ''
+import app
+
+SYNTHETIC_SIZE = (1280, 720)
+SYNTHETIC_VIDEO_SECONDS = 4
+SYNTHETIC_VIDEO_FPS = 15
+
+def synthetic_frame(index, size=SYNTHETIC_SIZE):
+    """Deterministic textured frame with a moving shape"""
+    width, height = size
+    rng = np.random.default_rng(index)
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    frame[:, :, 0] = np.linspace(40, 200, width, dtype=np.uint8)[None, :]
+    frame[:, :, 1] = np.linspace(60, 180, height, dtype=np.uint8)[:, None]
+    frame[:, :, 2] = 120
+    frame = cv.add(frame, rng.integers(0, 20, frame.shape, dtype=np.uint8))
+
+    center = (200 + (index * 15) % (width - 400), height // 2)
+    cv.ellipse(frame, center, (110, 140), 0, 0, 360, (150, 180, 220), -1)
+    cv.circle(frame, (center[0] - 40, center[1] - 30), 12, (40, 40, 40), -1)
+    cv.circle(frame, (center[0] + 40, center[1] - 30), 12, (40, 40, 40), -1)
+    return frame
+
+def prepare_fixtures(args, workdir):
+    """Fixture image and video paths (synthetic ones are written to workdir)"""
+    image_path = args.image
+    if image_path is None:
+        image_path = os.path.join(workdir, 'synthetic.jpg')
+        cv.imwrite(image_path, synthetic_frame(0))
+
+    video_path = args.video
+    if video_path is None:
+        video_path = os.path.join(workdir, 'synthetic.mp4')
+        writer = cv.VideoWriter(video_path, cv.VideoWriter_fourcc(*'mp4v'), SYNTHETIC_VIDEO_FPS,
+                                (640, 360))
+        for index in range(SYNTHETIC_VIDEO_SECONDS * SYNTHETIC_VIDEO_FPS):
+            writer.write(synthetic_frame(index, (640, 360)))
+        writer.release()
+
+    return image_path, video_path
+
+def percentile_summary(samples_ms):
+    """Wall-clock distribution of one benchmark, in milliseconds"""
+    samples = np.array(samples_ms)
+    return {
+        'runs': len(samples_ms),
+        'mean_ms': round(float(samples.mean()), 3),
+        'p50_ms': round(float(np.percentile(samples, 50)), 3),
+        'p95_ms': round(float(np.percentile(samples, 95)), 3),
+        'min_ms': round(float(samples.min()), 3),
+        'max_ms': round(float(samples.max()), 3)
+    }
+
+def stage_summary(timings, runs):
+    """Per-stage totals and per-run means from a stage timing accumulator"""
+    return {
+        stage: {
+            'total_ms': round(total_ms, 3),
+            'calls': calls,
+            'per_run_ms': round(total_ms / runs, 3)
+        }
+        for stage, (total_ms, calls) in sorted(timings.items())
+    }
+
+def measure(func, iterations, warmup=1):
+    """Run func repeatedly, returning wall-clock and stage timing summaries"""
+    for _ in range(warmup):
+        func()
+
+    timings = app.start_stage_timing()
+    samples = []
+    try:
+        for _ in range(iterations):
+            start = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - start) * 1000)
+    finally:
+        app.stop_stage_timing()
+
+    result = percentile_summary(samples)
+    result['stages'] = stage_summary(timings, iterations)
+    return result
+
+def bench_detect_upload(image_path, iterations):
+    """detect_persons_with_attention in upload mode, including image decode"""
+    def run():
+        stage_start = time.perf_counter()
+        image = cv.imread(image_path)
+        app.record_stage('decode', stage_start)
+        app.detect_persons_with_attention(image, mode="upload", quality=app.DEGRADATION_LEVELS[0])
+
+    return measure(run, iterations)
+
+def bench_detect_video(image_path, iterations, client):
+    """detect_persons_with_attention in video mode through /process_frame in a live session"""
+    with open(image_path, 'rb') as f:
+        payload = {'frame': 'data:image/jpeg;base64,' + base64.b64encode(f.read()).decode('ascii')}
+
+    client.post('/start_monitoring', json={'sessionId': 'benchmark'})
+
+    def run():
+        # Paksa inferensi penuh pada setiap frame
+        app.reset_frame_change_state()
+        response = client.post('/process_frame', json=payload)
+        if response.status_code != 200:
+            raise RuntimeError(f"process_frame returned {response.status_code}")
+
+    return measure(run, iterations)
+
+def bench_process_video_file(video_path, iterations, profile):
+    """process_video_file end to end (decode, analysis, encode)"""
+    outputs = []
+
+    def run():
+        output_path, _ = app.process_video_file(video_path, summary=app.create_detection_summary(),
+                                                tracker=app.create_person_tracker(), profile=profile)
+        outputs.append(output_path)
+
+    result = measure(run, iterations, warmup=0)
+    result['profile'] = profile
+    for output_path in outputs:
+        if output_path and os.path.exists(output_path):
+            os.remove(output_path)
+    return result
+
+def bench_live_pdf(workdir, iterations):
+    """generate_live_pdf_report on the session recorded by the video-mode benchmark"""
+    with app.monitoring_lock:
+        app.session_data['end_time'] = datetime.now()
+        session = dict(app.session_data)
+
+    output_path = os.path.join(workdir, 'live_report.pdf')
+    return measure(lambda: app.generate_live_pdf_report(session, output_path), iterations, warmup=0)
+
+def bench_upload_pdf(image_path, workdir, iterations):
+    """generate_upload_pdf_report for the fixture image's detections"""
+    _, detections = app.detect_persons_with_attention(cv.imread(image_path), mode="upload",
+                                                      quality=app.DEGRADATION_LEVELS[0])
+    detections = detections * 20
+    output_path = os.path.join(workdir, 'upload_report.pdf')
+    file_info = {'filename': os.path.basename(image_path), 'type': 'JPG'}
+    return measure(lambda: app.generate_upload_pdf_report(detections, file_info, output_path), iterations, warmup=0)
+
+def bench_session_recording(workdir, iterations):
+    """create_session_recording_from_frames on the recorded session frames"""
+    with app.monitoring_lock:
+        frames = list(app.session_data['recording_frames'])
+        start_time = app.session_data['start_time']
+        end_time = app.session_data['end_time']
+
+    output_path = os.path.join(workdir, 'recording.mp4')
+    result = measure(lambda: app.create_session_recording_from_frames(frames, output_path, start_time, end_time),
+                     iterations, warmup=0)
+    result['frames'] = len(frames)
+    return result
+
+def build_info():
+    """Environment the benchmark ran in"""
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                         cwd=os.path.dirname(os.path.abspath(__file__)),
+                                         stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        'commit': commit,
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'opencv': cv.__version__,
+        'ffmpeg': app.FFMPEG_PATH is not None
+    }
+
+def run_benchmarks(args):
+    if not app.init_mediapipe():
+        raise RuntimeError("MediaPipe initialization failed")
+
+    # Kualitas penuh agar hasil antar build dapat dibandingkan
+    app.pin_quality(0)
+
+    client = app.application.test_client()
+    workdir = tempfile.mkdtemp(prefix='sfa_bench_')
+    image_path, video_path = prepare_fixtures(args, workdir)
+
+    results = {'build': build_info(), 'fixtures': {
+        'image': image_path if args.image else 'synthetic',
+        'video': video_path if args.video else 'synthetic'
+    }, 'benchmarks': {}}
+    benchmarks = results['benchmarks']
+
+    benchmarks['detect_upload'] = bench_detect_upload(image_path, args.iterations)
+    benchmarks['detect_video'] = bench_detect_video(image_path, args.iterations, client)
+    benchmarks['process_video_file'] = bench_process_video_file(video_path, args.video_iterations, args.profile)
+    benchmarks['generate_live_pdf_report'] = bench_live_pdf(workdir, args.report_iterations)
+    benchmarks['generate_upload_pdf_report'] = bench_upload_pdf(image_path, workdir, args.report_iterations)
+    benchmarks['create_session_recording_from_frames'] = bench_session_recording(workdir, args.report_iterations)
+
+    client.post('/stop_monitoring', json={'sessionId': 'benchmark'})
+
+    return results
+
+def compare_results(baseline, current, threshold):
+    """Benchmarks whose p50 regressed by more than threshold (fraction)"""
+    regressions = []
+    for name, result in current['benchmarks'].items():
+        base = baseline.get('benchmarks', {}).get(name)
+        if not base or base['p50_ms'] <= 0:
+            continue
+        change = (result['p50_ms'] - base['p50_ms']) / base['p50_ms']
+        print(f"{name:40s} {base['p50_ms']:10.2f} -> {result['p50_ms']:10.2f} ms ({change:+.1%})")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Detection pipeline benchmark suite")
+    parser.add_argument('--image', help="fixture image (default: synthetic frame)")
+    parser.add_argument('--video', help="fixture video (default: synthetic clip)")
+    parser.add_argument('--iterations', type=int, default=20, help="runs for per-frame benchmarks")
+    parser.add_argument('--video-iterations', type=int, default=3, help="runs of process_video_file")
+    parser.add_argument('--report-iterations', type=int, default=3, help="runs of report and recording generation")
+    parser.add_argument('--profile', default='full', help="video output profile for process_video_file")
+    parser.add_argument('--output', help="write JSON results to this file (default: stdout)")
+    parser.add_argument('--compare', help="baseline JSON results to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10, help="p50 regression threshold for --compare")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args)
+    output = json.dumps(results, indent=2)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_results(baseline, results, args.threshold)
+        if regressions:
+            print(f"Regressions over {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
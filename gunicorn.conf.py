@@ -0,0 +1,9 @@
+"""Gunicorn hooks: models are built and warmed up in each worker after fork.
+
+With --preload the app is imported once in the master; MediaPipe graphs and the
+inference threads must not be created there, so every worker builds its own.
+"""
+
+def post_fork(server, worker):
+    import app
+    app.start_worker_warmup()
@@ -0,0 +1,361 @@
+"""Concurrent-client load generator for live monitoring.
+
+    python load_test.py --spawn --clients 1,2,4,8 --duration 60 --fixture face.jpg
+    python load_test.py --url http://127.0.0.1:5000 --server-pid 1234 --clients 4
+
+Every simulated client follows the live.js protocol: start_monitoring, a
+process_frame loop at the client interval (adapting to the server's backpressure
+hints like live.js does), get_monitoring_data every 3 s, /health every 10 s,
+sync_alerts every 30 s and stop_monitoring at the end. Each client count is one
+stage; the JSON report has per-endpoint throughput and p50/p95/p99 latency,
+the mean server-side stage breakdown from Server-Timing headers, dropped
+frames and server memory growth (needs --spawn or --server-pid).
+
+The app keeps one live session per node, so with several clients only the first
+start_monitoring succeeds and the others share that session; the rejections are
+counted under start_monitoring errors. With the in-process backend
+(SESSION_BACKEND=memory) one worker serves every request. With
+SESSION_BACKEND=sqlite and several workers, decode and inference run in
+parallel, but session-state updates from all workers take turns on a file lock
+(the lock_wait stage). The report records which backend answered, taken from
+/monitoring_status.
+"""
+import argparse
+import base64
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+import cv2 as cv
+import numpy as np
+
+FRAME_SIZE = (640, 480)
+FRAME_JPEG_QUALITY = 70          # sama dengan toDataURL('image/jpeg', 0.7) di live.js
+FIXTURE_VARIANTS = 30
+POLL_INTERVALS = {               # detik, sama dengan timer di live.js
+    'get_monitoring_data': 3,
+    'health': 10,
+    'sync_alerts': 30
+}
+BACKPRESSURE_MIN_CHANGE_MS = 250
+MEMORY_SAMPLE_SECONDS = 1.0
+
+def fixture_frames(fixture_path):
+    """Data-URL JPEG frames: jittered copies of the fixture (or a synthetic face-like frame)"""
+    if fixture_path:
+        base = cv.resize(cv.imread(fixture_path), FRAME_SIZE)
+    else:
+        base = np.full((FRAME_SIZE[1], FRAME_SIZE[0], 3), 110, dtype=np.uint8)
+        cv.ellipse(base, (320, 240), (90, 120), 0, 0, 360, (150, 180, 220), -1)
+
+    frames = []
+    rng = np.random.default_rng(0)
+    for index in range(FIXTURE_VARIANTS):
+        # Geser sedikit dan tambahkan noise seperti kamera sungguhan
+        shift = np.float32([[1, 0, (index % 7) - 3], [0, 1, (index % 5) - 2]])
+        frame = cv.warpAffine(base, shift, FRAME_SIZE, borderMode=cv.BORDER_REPLICATE)
+        frame = cv.add(frame, rng.integers(0, 6, frame.shape, dtype=np.uint8))
+        _, buffer = cv.imencode('.jpg', frame, [cv.IMWRITE_JPEG_QUALITY, FRAME_JPEG_QUALITY])
+        frames.append('data:image/jpeg;base64,' + base64.b64encode(buffer).decode('ascii'))
+    return frames
+
+class Recorder:
+    """Thread-safe latency and status collection per endpoint"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.app_errors = defaultdict(int)
+        self.server_timing = defaultdict(lambda: defaultdict(float))
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        self.frames_reused = 0
+
+    def add(self, endpoint, status, latency_ms, app_error=False):
+        with self.lock:
+            self.latencies[endpoint].append(latency_ms)
+            self.statuses[endpoint][str(status)] += 1
+            if app_error:
+                self.app_errors[endpoint] += 1
+
+    def add_server_timing(self, endpoint, header):
+        """Accumulate stage durations from a Server-Timing header"""
+        with self.lock:
+            for entry in header.split(','):
+                name, _, params = entry.strip().partition(';')
+                if params.startswith('dur='):
+                    self.server_timing[endpoint][name] += float(params[4:])
+
+    def frame_result(self, status, data):
+        with self.lock:
+            if status == 429:
+                self.frames_dropped += 1
+            elif status == 200 and data.get('success'):
+                self.frames_processed += 1
+                if data.get('frame_reused'):
+                    self.frames_reused += 1
+
+def request_json(base_url, recorder, endpoint, path, payload=None, timeout=60):
+    """One HTTP request, recorded; returns (status, parsed body)"""
+    body = None
+    headers = {}
+    if payload is not None:
+        body = json.dumps(payload).encode()
+        headers['Content-Type'] = 'application/json'
+
+    request = urllib.request.Request(base_url + path, data=body, headers=headers,
+                                     method='POST' if payload is not None else 'GET')
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            status, raw, server_timing = response.status, response.read(), response.headers.get('Server-Timing')
+    except urllib.error.HTTPError as e:
+        status, raw, server_timing = e.code, e.read(), e.headers.get('Server-Timing')
+    except (urllib.error.URLError, OSError) as e:
+        recorder.add(endpoint, type(e).__name__, (time.perf_counter() - start) * 1000, app_error=True)
+        return None, {}
+
+    latency_ms = (time.perf_counter() - start) * 1000
+    if server_timing:
+        recorder.add_server_timing(endpoint, server_timing)
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        data = {}
+
+    app_error = status >= 400 or data.get('status') == 'error' or 'error' in data
+    recorder.add(endpoint, status, latency_ms, app_error=app_error and status != 429)
+    return status, data
+
+def run_client(client_idx, base_url, frames, interval_ms, deadline, recorder, follow_backpressure):
+    """One simulated live.js client until the deadline"""
+    session_id = f"load_{client_idx}_{int(time.time() * 1000)}"
+    request_json(base_url, recorder, 'start_monitoring', '/start_monitoring', {'sessionId': session_id})
+
+    stop_event = threading.Event()
+
+    def poll_loop():
+        next_due = {endpoint: time.time() + interval for endpoint, interval in POLL_INTERVALS.items()}
+        while not stop_event.is_set():
+            endpoint = min(next_due, key=next_due.get)
+            if stop_event.wait(max(0, next_due[endpoint] - time.time())):
+                break
+            if endpoint == 'get_monitoring_data':
+                request_json(base_url, recorder, endpoint, '/get_monitoring_data')
+            elif endpoint == 'health':
+                request_json(base_url, recorder, endpoint, '/health')
+            else:
+                request_json(base_url, recorder, endpoint, '/sync_alerts', {
+                    'sessionId': session_id,
+                    'alerts': [{'id': f"{session_id}_NOT FOCUSED_{int(time.time() * 1000)}",
+                                'type': 'NOT FOCUSED', 'sessionId': session_id}]
+                })
+            next_due[endpoint] = time.time() + POLL_INTERVALS[endpoint]
+
+    poller = threading.Thread(target=poll_loop, daemon=True)
+    poller.start()
+
+    frame_idx = client_idx
+    next_frame = time.time()
+    while time.time() < deadline:
+        status, data = request_json(base_url, recorder, 'process_frame', '/process_frame', {
+            'frame': frames[frame_idx % len(frames)],
+            'sessionId': session_id,
+            'timestamp': int(time.time() * 1000)
+        })
+        recorder.frame_result(status, data)
+        frame_idx += 1
+
+        # Interval mengikuti saran backpressure seperti applyBackpressureHints di live.js
+        suggested = (data.get('backpressure') or {}).get('suggested_interval_ms')
+        if follow_backpressure and suggested and abs(suggested - interval_ms) >= BACKPRESSURE_MIN_CHANGE_MS:
+            interval_ms = suggested
+
+        # setInterval: frame berikutnya dikirim sesuai jadwal, tidak menunggu respons sebelumnya
+        next_frame += interval_ms / 1000
+        delay = next_frame - time.time()
+        if delay > 0:
+            time.sleep(min(delay, max(0, deadline - time.time())))
+        else:
+            next_frame = time.time()
+
+    stop_event.set()
+    poller.join()
+    request_json(base_url, recorder, 'stop_monitoring', '/stop_monitoring', {'sessionId': session_id, 'alerts': []})
+
+def read_rss_bytes(pid):
+    """Resident memory of a process (Linux /proc)"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def sample_memory(pid, samples, stop_event):
+    while not stop_event.is_set():
+        rss = read_rss_bytes(pid)
+        if rss is not None:
+            samples.append(rss)
+        stop_event.wait(MEMORY_SAMPLE_SECONDS)
+
+def latency_summary(samples_ms, duration):
+    samples = np.array(samples_ms)
+    return {
+        'requests': len(samples_ms),
+        'throughput_rps': round(len(samples_ms) / duration, 2),
+        'p50_ms': round(float(np.percentile(samples, 50)), 1),
+        'p95_ms': round(float(np.percentile(samples, 95)), 1),
+        'p99_ms': round(float(np.percentile(samples, 99)), 1),
+        'max_ms': round(float(samples.max()), 1)
+    }
+
+def run_stage(args, clients, frames, server_pid):
+    """Run one client count for args.duration seconds"""
+    recorder = Recorder()
+    memory_samples = []
+    memory_stop = threading.Event()
+    if server_pid:
+        memory_thread = threading.Thread(target=sample_memory, args=(server_pid, memory_samples, memory_stop),
+                                         daemon=True)
+        memory_thread.start()
+
+    start = time.time()
+    deadline = start + args.duration
+    threads = []
+    for client_idx in range(clients):
+        thread = threading.Thread(target=run_client, args=(
+            client_idx, args.url, frames, args.interval_ms, deadline, recorder, not args.fixed_interval
+        ), daemon=True)
+        threads.append(thread)
+        thread.start()
+        time.sleep(args.ramp / max(1, clients))
+
+    for thread in threads:
+        thread.join()
+    duration = time.time() - start
+    memory_stop.set()
+
+    stage = {
+        'clients': clients,
+        'duration_seconds': round(duration, 1),
+        'frames_processed': recorder.frames_processed,
+        'frames_dropped': recorder.frames_dropped,
+        'frames_reused': recorder.frames_reused,
+        'processed_fps': round(recorder.frames_processed / duration, 2),
+        'processed_fps_per_core': round(recorder.frames_processed / duration / args.cores, 2),
+        'endpoints': {}
+    }
+
+    for endpoint, samples in sorted(recorder.latencies.items()):
+        summary = latency_summary(samples, duration)
+        summary['status_codes'] = dict(recorder.statuses[endpoint])
+        summary['errors'] = recorder.app_errors[endpoint]
+        if endpoint in recorder.server_timing:
+            # Rata-rata per request dari header Server-Timing
+            summary['server_timing_mean_ms'] = {
+                stage: round(total / len(samples), 2)
+                for stage, total in sorted(recorder.server_timing[endpoint].items(), key=lambda item: -item[1])
+            }
+        stage['endpoints'][endpoint] = summary
+
+    if memory_samples:
+        stage['server_memory'] = {
+            'start_mb': round(memory_samples[0] / 2**20, 1),
+            'end_mb': round(memory_samples[-1] / 2**20, 1),
+            'peak_mb': round(max(memory_samples) / 2**20, 1),
+            'growth_mb': round((memory_samples[-1] - memory_samples[0]) / 2**20, 1)
+        }
+    return stage
+
+def server_backend(base_url):
+    """Session backend reported by /monitoring_status ('memory' or 'sqlite'), None if unknown"""
+    try:
+        with urllib.request.urlopen(base_url + '/monitoring_status', timeout=10) as response:
+            return json.loads(response.read()).get('session_backend')
+    except (urllib.error.URLError, OSError, ValueError):
+        return None
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def spawn_server():
+    """Start app.py on a free local port and wait until /health answers"""
+    port = free_port()
+    env = dict(os.environ, PORT=str(port))
+    process = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')],
+                               env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+
+    for _ in range(120):
+        if process.poll() is not None:
+            raise RuntimeError("Server exited during startup")
+        try:
+            with urllib.request.urlopen(url + '/health', timeout=2):
+                return process, url
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.5)
+
+    process.terminate()
+    raise RuntimeError("Server did not become healthy")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for the live monitoring protocol")
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help="server base URL")
+    parser.add_argument('--spawn', action='store_true', help="start app.py locally (enables memory sampling)")
+    parser.add_argument('--server-pid', type=int, help="server process id for memory sampling")
+    parser.add_argument('--clients', default='1,2,4', help="comma-separated client counts, one stage each")
+    parser.add_argument('--duration', type=float, default=30, help="seconds per stage")
+    parser.add_argument('--ramp', type=float, default=2, help="seconds over which clients start")
+    parser.add_argument('--interval-ms', type=int, default=1000, help="initial frame interval (live.js default)")
+    parser.add_argument('--fixed-interval', action='store_true', help="ignore backpressure hints")
+    parser.add_argument('--fixture', help="fixture image for frames (default: synthetic)")
+    parser.add_argument('--cores', type=int, default=os.cpu_count() or 1, help="server cores for per-core figures")
+    parser.add_argument('--output', help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    server = None
+    server_pid = args.server_pid
+    if args.spawn:
+        server, args.url = spawn_server()
+        server_pid = server.pid
+
+    frames = fixture_frames(args.fixture)
+    report = {'url': args.url, 'session_backend': server_backend(args.url), 'interval_ms': args.interval_ms,
+              'cores': args.cores, 'stages': []}
+    print(f"session backend: {report['session_backend']}", file=sys.stderr)
+
+    try:
+        for clients in [int(value) for value in args.clients.split(',')]:
+            stage = run_stage(args, clients, frames, server_pid)
+            report['stages'].append(stage)
+            frame_stats = stage['endpoints'].get('process_frame', {})
+            print(f"{clients:4d} clients: {stage['processed_fps']:6.2f} frames/s, "
+                  f"process_frame p50 {frame_stats.get('p50_ms')} ms p99 {frame_stats.get('p99_ms')} ms, "
+                  f"dropped {stage['frames_dropped']}", file=sys.stderr)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""Replay a captured live monitoring session without a browser, camera or network.
+
+    SESSION_CAPTURE_DIR=/tmp/captures python app.py          # capture sessions from live.js
+    python replay_session.py /tmp/captures/capture_....jsonl --speed 0 --runs 3
+
+The captured /process_frame payloads are fed through start_monitoring ->
+process_frame -> stop_monitoring in-process, at the original pace (--speed 1),
+accelerated (--speed 4) or back to back (--speed 0). The app clock is replaced
+by one that follows the captured arrival offsets, so alert durations do not
+depend on the replay speed. The report lists latency percentiles and whether the
+per-frame statuses, alerts and statistics match the capture and across runs;
+the exit code is 1 when any run differs from the capture or from another run.
+The replay runs without a session store and under its own session id, so the
+captured session's stored history is left untouched.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+
+import numpy as np
+
+logging.basicConfig(level=logging.WARNING)
+
+STATISTICS_TOLERANCE_SECONDS = 0.5   # toleransi durasi statistik antar replay
+
+class ReplayClock:
+    """Stand-in for the time module in app: time() follows the captured session timeline"""
+
+    def __init__(self):
+        self.origin = time.time()
+        self.offset = 0.0
+        self.offset_set_at = time.perf_counter()
+
+    def advance_to(self, offset):
+        """Jump to a captured arrival offset (seconds since session start)"""
+        self.offset = max(self.offset, offset)
+        self.offset_set_at = time.perf_counter()
+
+    def time(self):
+        # Waktu proses nyata tetap berjalan di antara dua offset rekaman
+        return self.origin + self.offset + (time.perf_counter() - self.offset_set_at)
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+def load_capture(path):
+    """Start record, frame records and stop record of a capture file"""
+    start, frames, stop = None, [], None
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record['type'] == 'start':
+                start = record
+            elif record['type'] == 'frame':
+                frames.append(record)
+            elif record['type'] == 'stop':
+                stop = record
+    if start is None:
+        raise ValueError(f"{path} is not a session capture")
+    return start, frames, stop
+
+def latency_summary(samples_ms):
+    """Latency percentiles in milliseconds"""
+    if not samples_ms:
+        return {'count': 0}
+    samples = np.array(samples_ms)
+    return {
+        'count': len(samples_ms),
+        'mean_ms': round(float(samples.mean()), 2),
+        'p50_ms': round(float(np.percentile(samples, 50)), 2),
+        'p95_ms': round(float(np.percentile(samples, 95)), 2),
+        'p99_ms': round(float(np.percentile(samples, 99)), 2),
+        'max_ms': round(float(samples.max()), 2)
+    }
+
+def replay_once(app, start, frames, stop, speed):
+    """One replay of the capture, returning latencies, statuses, alerts and statistics"""
+    clock = ReplayClock()
+    app.time = clock
+    client = app.application.test_client()
+
+    # Id baru agar sesi asli di session store tidak tertimpa
+    session_id = f"replay_{uuid.uuid4().hex[:12]}"
+    client.post('/start_monitoring', json={'sessionId': session_id})
+
+    latencies = []
+    statuses = []
+    reused = 0
+    run_start = time.perf_counter()
+
+    for record in frames:
+        if speed > 0:
+            delay = record['t'] / speed - (time.perf_counter() - run_start)
+            if delay > 0:
+                time.sleep(delay)
+
+        clock.advance_to(record['t'])
+        request_start = time.perf_counter()
+        response = client.post('/process_frame', json={'frame': record['frame']})
+        latencies.append((time.perf_counter() - request_start) * 1000)
+
+        data = response.get_json() or {}
+        if response.status_code != 200:
+            statuses.append({'error': response.status_code})
+            continue
+        reused += 1 if data.get('frame_reused') else 0
+        statuses.append([detection['status'] for detection in data.get('detections', [])])
+
+    clock.advance_to(stop['t'] if stop else (frames[-1]['t'] if frames else 0))
+    client.post('/stop_monitoring', json={'sessionId': session_id})
+
+    with app.monitoring_lock:
+        alerts = [{"detection": alert['detection'], "duration": alert['duration'],
+                   "is_reminder": alert['is_reminder']} for alert in app.session_data['alerts']]
+        focus_statistics = dict(app.session_data['focus_statistics'])
+
+    app.time = time
+    return {
+        'latency': latency_summary(latencies),
+        'wall_seconds': round(time.perf_counter() - run_start, 3),
+        'frames_reused': reused,
+        'statuses': statuses,
+        'alerts': alerts,
+        'focus_statistics': focus_statistics
+    }
+
+def statistics_match(expected, actual):
+    """Counts equal, durations within STATISTICS_TOLERANCE_SECONDS"""
+    for key, value in expected.items():
+        other = actual.get(key, 0)
+        if key.endswith('_time'):
+            if abs(value - other) > STATISTICS_TOLERANCE_SECONDS:
+                return False
+        elif value != other:
+            return False
+    return True
+
+def compare_outcomes(expected, actual):
+    """Mismatches between two session outcomes"""
+    mismatches = []
+
+    frame_diffs = [idx for idx, (a, b) in enumerate(zip(expected['statuses'], actual['statuses'])) if a != b]
+    if frame_diffs or len(expected['statuses']) != len(actual['statuses']):
+        mismatches.append(f"statuses differ on {len(frame_diffs)} frames (first: {frame_diffs[:5]})")
+
+    expected_alerts = [(alert['detection'], alert['is_reminder']) for alert in expected['alerts']]
+    actual_alerts = [(alert['detection'], alert['is_reminder']) for alert in actual['alerts']]
+    if expected_alerts != actual_alerts:
+        mismatches.append(f"alerts differ: {expected_alerts} vs {actual_alerts}")
+
+    if not statistics_match(expected['focus_statistics'], actual['focus_statistics']):
+        mismatches.append("focus statistics differ")
+
+    return mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a captured live monitoring session")
+    parser.add_argument('capture', help="capture file written with SESSION_CAPTURE_DIR")
+    parser.add_argument('--speed', type=float, default=1.0, help="pace multiplier (1 = original, 0 = no pacing)")
+    parser.add_argument('--runs', type=int, default=1, help="number of replays to compare with each other")
+    parser.add_argument('--include-dropped', action='store_true', help="also replay frames the server dropped")
+    parser.add_argument('--adaptive-quality', action='store_true',
+                        help="keep adaptive degradation (results then depend on machine load)")
+    parser.add_argument('--output', help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    start, frames, stop = load_capture(args.capture)
+    replayed = [record for record in frames if args.include_dropped or not record['dropped']]
+
+    # Replay tidak menulis ke session store produksi
+    os.environ['SESSION_STORE_PATH'] = ''
+    import app
+    if not app.init_mediapipe():
+        raise RuntimeError("MediaPipe initialization failed")
+    if not args.adaptive_quality:
+        # Kualitas tetap agar hasil deterministik
+        app.pin_quality(0)
+
+    captured = {
+        'statuses': [record['statuses'] for record in replayed],
+        'alerts': stop['alerts'] if stop else [],
+        'focus_statistics': stop['focus_statistics'] if stop else {}
+    }
+
+    runs = [replay_once(app, start, replayed, stop, args.speed) for _ in range(args.runs)]
+
+    report = {
+        'capture': args.capture,
+        'frames': len(frames),
+        'frames_replayed': len(replayed),
+        'speed': args.speed,
+        'captured_latency': latency_summary([record['latency_ms'] for record in frames]),
+        'runs': [{key: run[key] for key in ('latency', 'wall_seconds', 'frames_reused', 'alerts', 'focus_statistics')}
+                 for run in runs],
+        'matches_capture': [],
+        'deterministic': True,
+        'warnings': []
+    }
+
+    # Perbedaan kualitas menjelaskan selisih, bukan selisih itu sendiri
+    degraded = any(record.get('quality_level', 0) > 0 for record in replayed)
+    if degraded and not args.adaptive_quality:
+        report['warnings'].append("capture ran at reduced quality, replay at full quality")
+
+    for run in runs:
+        mismatches = compare_outcomes(captured, run) if stop else ["capture has no stop record"]
+        report['matches_capture'].append(mismatches or True)
+
+    for run in runs[1:]:
+        if compare_outcomes(runs[0], run):
+            report['deterministic'] = False
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+    print(output)
+
+    matches_capture = all(result is True for result in report['matches_capture'])
+    sys.exit(0 if report['deterministic'] and matches_capture else 1)
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,7 @@ let clientCanvas = null;
 let clientCtx = null;
 let clientStream = null;
 let processingInterval = null;
+let processingIntervalMs = 1000;
 
 // Real-time tracking
 let clientAlerts = [];
@@ -39,6 +40,7 @@ let alertCooldown = 5000; // 5 detik
 
 // Manajemen Sesi
 let sessionId = null;
+let sessionAffinity = null;
 let sessionSyncTimer = null;
 let fileRetryAttempts = {};
 let maxRetryAttempts = 5;
@@ -86,6 +88,15 @@ function initializePage() {
     console.log('Session initialized:', sessionId);
 }
 
+// Header request sesi live, termasuk token afinitas node dari /start_monitoring
+function sessionHeaders() {
+    const headers = { 'Content-Type': 'application/json' };
+    if (sessionAffinity) {
+        headers['X-Session-Affinity'] = sessionAffinity;
+    }
+    return headers;
+}
+
 function initializeAudioSystem() {
     try {
         if (typeof window.AudioContext !== 'undefined') {
@@ -477,6 +488,7 @@ async function startMonitoring() {
         if (data.status !== 'success') {
             throw new Error(data.message);
         }
+        sessionAffinity = data.affinity_token || null;
 
         if (usingClientCamera) {
             await initializeClientCamera();
@@ -515,7 +527,7 @@ async function syncAlertsWithServer() {
     try {
         const response = await fetch('/sync_alerts', {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
+            headers: sessionHeaders(),
             body: JSON.stringify({
                 sessionId: sessionId,
                 alerts: clientAlerts
@@ -545,7 +557,8 @@ async function initializeClientCamera() {
         clientVideo.style.display = 'none';
         clientCanvas.style.display = 'block';
 
-        processingInterval = setInterval(processClientFrame, 1000);
+        processingIntervalMs = 1000;
+        processingInterval = setInterval(processClientFrame, processingIntervalMs);
 
     } catch (error) {
         throw new Error('Failed to access device camera: ' + error.message);
@@ -567,7 +580,7 @@ function processClientFrame() {
 
         fetch('/process_frame', {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
+            headers: sessionHeaders(),
             body: JSON.stringify({
                 frame: frameData,
                 sessionId: sessionId,
@@ -576,6 +589,10 @@ function processClientFrame() {
         })
             .then(response => response.json())
             .then(data => {
+                if (data.backpressure) {
+                    applyBackpressureHints(data.backpressure);
+                }
+
                 if (data.success && data.processed_frame) {
                     const img = new Image();
                     img.onload = function () {
@@ -602,6 +619,19 @@ function processClientFrame() {
     }
 }
 
+// Sesuaikan interval capture dengan saran server
+function applyBackpressureHints(backpressure) {
+    const suggested = backpressure.suggested_interval_ms;
+    if (!suggested || !processingInterval || document.hidden) return;
+
+    // Abaikan perubahan kecil agar interval tidak terus direset
+    if (Math.abs(suggested - processingIntervalMs) < 250) return;
+
+    processingIntervalMs = suggested;
+    clearInterval(processingInterval);
+    processingInterval = setInterval(processClientFrame, processingIntervalMs);
+}
+
 // NO PERSON penanganan deteksi
 function handleNoPersonDetection() {
     const currentTime = Date.now();
@@ -981,7 +1011,7 @@ async function stopMonitoring() {
 
         const response = await fetch('/stop_monitoring', {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
+            headers: sessionHeaders(),
             body: JSON.stringify(stopData)
         });
         const data = await response.json();
@@ -1176,7 +1206,7 @@ function updateUIForActiveMonitoring() {
 function startDataUpdates() {
     dataUpdateTimer = setInterval(() => {
         if (isMonitoring && !usingClientCamera) {
-            fetch('/get_monitoring_data')
+            fetch('/get_monitoring_data', { headers: sessionHeaders() })
                 .then(response => response.json())
                 .then(data => {
                     if (!data.error) {
@@ -1405,7 +1435,7 @@ window.addEventListener('beforeunload', function () {
     if (isMonitoring) {
         fetch('/stop_monitoring', {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
+            headers: sessionHeaders(),
             body: JSON.stringify({
                 sessionId: sessionId,
                 alerts: clientAlerts,
@@ -1431,12 +1461,12 @@ document.addEventListener('visibilitychange', function () {
     if (document.hidden && isMonitoring) {
         if (processingInterval) {
             clearInterval(processingInterval);
-            processingInterval = setInterval(processClientFrame, 3000);
+            processingInterval = setInterval(processClientFrame, Math.max(3000, processingIntervalMs));
         }
     } else if (!document.hidden && isMonitoring) {
         if (processingInterval) {
             clearInterval(processingInterval);
-            processingInterval = setInterval(processClientFrame, 1000);
+            processingInterval = setInterval(processClientFrame, processingIntervalMs);
         }
     }
 });
@@ -0,0 +1,165 @@
+"""Shared live session backend (SESSION_BACKEND=sqlite) across forked workers.
+
+    python -m pytest tests
+"""
+import base64
+import fcntl
+import os
+import sys
+import tempfile
+import threading
+
+import cv2 as cv
+import numpy as np
+
+# Konfigurasi dibaca saat app diimpor
+STORE_DIR = tempfile.mkdtemp(prefix='sfa_test_')
+os.environ['SESSION_BACKEND'] = 'sqlite'
+os.environ['SESSION_STORE_PATH'] = os.path.join(STORE_DIR, 'sessions.db')
+os.environ['INFERENCE_PROCESSES'] = '0'
+os.environ['NODE_ID'] = 'test-node'
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app
+
+FRAMES_PER_WORKER = 4
+
+def frame_payload():
+    image = np.full((360, 640, 3), 128, dtype=np.uint8)
+    _, buffer = cv.imencode('.jpg', image)
+    return {'frame': 'data:image/jpeg;base64,' + base64.b64encode(buffer.tobytes()).decode('ascii')}
+
+def post_frames(count):
+    """Body of a forked worker: post frames to the shared session, exit 0 when all succeeded"""
+    client = app.application.test_client()
+    payload = frame_payload()
+    for _ in range(count):
+        app.reset_frame_change_state()
+        if client.post('/process_frame', json=payload).status_code != 200:
+            return 1
+    app.flush_session_store()
+    return 0
+
+def test_backend_is_shared():
+    assert app.session_backend.name == 'sqlite'
+    assert app.session_backend.shared
+
+def test_forked_workers_combine_recording_frames():
+    client = app.application.test_client()
+    response = client.post('/start_monitoring', json={'sessionId': 'test-fork'})
+    assert response.get_json()['status'] == 'success'
+
+    pids = []
+    for _ in range(2):
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                code = post_frames(FRAMES_PER_WORKER)
+            finally:
+                os._exit(code)
+        pids.append(pid)
+
+    for pid in pids:
+        _, status = os.waitpid(pid, 0)
+        assert os.WEXITSTATUS(status) == 0
+
+    status = client.get('/monitoring_status').get_json()
+    assert status['frames_processed'] == 2 * FRAMES_PER_WORKER
+
+    response = client.post('/stop_monitoring', json={'sessionId': 'test-fork'})
+    data = response.get_json()
+    assert data['status'] == 'success'
+    assert data['frames_captured'] == 2 * FRAMES_PER_WORKER
+
+    # Frame JPEG tidak disimpan lagi setelah rekaman dibuat
+    app.flush_session_store()
+    conn = app.open_session_store()
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM session_frames WHERE session_id = 'test-fork'").fetchone()[0] == 0
+    finally:
+        conn.close()
+
+def test_misdirected_live_request_is_rejected():
+    client = app.application.test_client()
+    response = client.post('/process_frame', json=frame_payload(),
+                           headers={app.SESSION_AFFINITY_HEADER: 'other-node:x'})
+    assert response.status_code == 421
+    assert response.get_json()['node'] == 'other-node'
+
+    response = client.post('/sync_alerts', json={'sessionId': 'x', 'alerts': []},
+                           headers={app.SESSION_AFFINITY_HEADER: app.session_affinity_token('x')})
+    assert response.status_code == 200
+
+def file_lock_is_free():
+    with open(app.session_backend.lock_path, 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return True
+
+def test_live_session_scope_is_reentrant():
+    other_thread_entered = threading.Event()
+
+    def enter_from_other_thread():
+        with app.live_session_scope():
+            other_thread_entered.set()
+
+    with app.live_session_scope():
+        with app.live_session_scope():
+            assert app.live_session_local.depth == 2
+
+        # Lock tetap dipegang sampai scope terluar selesai
+        assert app.live_session_local.depth == 1
+        assert not file_lock_is_free()
+        thread = threading.Thread(target=enter_from_other_thread)
+        thread.start()
+        assert not other_thread_entered.wait(0.2)
+
+    thread.join(5)
+    assert other_thread_entered.is_set()
+    assert app.live_session_local.depth == 0
+    assert file_lock_is_free()
+
+def test_state_is_reloaded_only_after_another_worker_saves():
+    other_worker = app.SQLiteSessionBackend(app.SESSION_STORE_PATH)
+
+    with app.live_session_scope():
+        state = app.live_state_snapshot()
+    assert app.session_backend.load() is None
+
+    state['session_data']['session_id'] = 'saved-elsewhere'
+    other_worker.connect()
+    other_worker.load()
+    other_worker.save(state)
+
+    assert app.session_backend.load()['session_data']['session_id'] == 'saved-elsewhere'
+    assert app.session_backend.load() is None
+
+def test_stale_shared_session_is_abandoned_on_next_start():
+    client = app.application.test_client()
+    assert client.post('/start_monitoring', json={'sessionId': 'test-stale'}).get_json()['status'] == 'success'
+
+    # Worker yang menjalankan sesi hilang: state tidak diperbarui lebih lama dari batas pemulihan
+    conn = app.open_session_store()
+    try:
+        with conn:
+            conn.execute("UPDATE live_state SET updated = updated - ? WHERE id = 1",
+                         (app.SESSION_RECOVERY_MAX_AGE + 1,))
+    finally:
+        conn.close()
+
+    response = client.post('/start_monitoring', json={'sessionId': 'test-fresh'})
+    assert response.get_json()['status'] == 'success'
+    assert client.get('/monitoring_status').get_json()['session_id'] == 'test-fresh'
+
+    app.flush_session_store()
+    conn = app.open_session_store()
+    try:
+        assert conn.execute("SELECT status FROM sessions WHERE session_id = 'test-stale'").fetchone()[0] == 'abandoned'
+    finally:
+        conn.close()
+
+    client.post('/stop_monitoring', json={'sessionId': 'test-fresh'})